@@ -1,27 +1,110 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-import os
-import gspread
-from google.oauth2.service_account import Credentials
+import time
+import queue
+import atexit
+import logging
+import threading
 
+import storage
+from storage import ResponseStore
+from spool import Spool, SPOOL_FILE
+from static_assets import inject_css, logo
 
-DATA_FILE = "responses.csv"
-LOGO_PATH = "assets/msc_logo.png"
 
-def get_ws():
-    creds_info = st.secrets["gcp_service_account"]
-    scopes = ["https://www.googleapis.com/auth/spreadsheets"]
-    creds = Credentials.from_service_account_info(creds_info, scopes=scopes)
-    client = gspread.authorize(creds)
-    sheet_id = st.secrets["sheets"]["spreadsheet_id"]
-    ws_name = st.secrets["sheets"]["worksheet_name"]
-    return client.open_by_key(sheet_id).worksheet(ws_name)
+DATA_FILE = "responses.csv"
 
-def append_to_sheet(timestamp, department, answers):
-    ws = get_ws()
-    row = [timestamp, department] + list(answers)
-    ws.append_row(row, value_input_option="USER_ENTERED")
+WRITE_BATCH_SIZE = 50
+WRITE_FLUSH_SECONDS = 2.0
+WRITE_MAX_BACKOFF_SECONDS = 60.0
+WRITE_TIMEOUT_SECONDS = 30.0
+ORPHAN_CHECK_SECONDS = 60.0
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseWriter:
+    def __init__(self, store: ResponseStore, spool: Spool, batch_size: int = WRITE_BATCH_SIZE, flush_seconds: float = WRITE_FLUSH_SECONDS):
+        self._store = store
+        self._spool = spool
+        self._batch_size = batch_size
+        self._flush_seconds = flush_seconds
+        self._queue: queue.Queue = queue.Queue()
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="response-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, values: list) -> None:
+        # The row is durable once it is in the spool; the queue only wakes the
+        # writer thread so it can ship it.
+        self._queue.put(self._spool.append(values))
+
+    def close(self, timeout: float = 10.0) -> None:
+        self._closed.set()
+        self._queue.put(None)
+        self._thread.join(timeout)
+        # A thread still stuck in an append keeps the spool, and with it the
+        # journal lock, so no other writer can take over its rows.
+        if not self._thread.is_alive():
+            self._spool.close()
+
+    def _wait(self) -> None:
+        # Block for the first new row, then keep draining until the batch is
+        # full or the flush window has passed, so bursts go out as a single
+        # append.
+        if not self._spool.pending(1) and not self._closed.is_set():
+            try:
+                self._queue.get(timeout=ORPHAN_CHECK_SECONDS)
+            except queue.Empty:
+                # While idle, pick up rows left behind by form processes that
+                # have gone away since this one started.
+                self._spool.adopt_orphans()
+                return
+        deadline = time.monotonic() + self._flush_seconds
+        while len(self._spool.pending(self._batch_size)) < self._batch_size and not self._closed.is_set():
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+
+    def _run(self) -> None:
+        backoff = 1.0
+        while True:
+            self._wait()
+            batch = self._spool.pending(self._batch_size)
+            if batch:
+                try:
+                    self._store.append([values for _, values in batch])
+                except Exception:
+                    logger.exception("Failed to append %d survey rows, retrying in %.0fs", len(batch), backoff)
+                    if self._closed.is_set():
+                        return
+                    self._closed.wait(backoff)
+                    backoff = min(backoff * 2, WRITE_MAX_BACKOFF_SECONDS)
+                    continue
+                self._spool.ack(batch[-1][0])
+                backoff = 1.0
+                if self._spool.pending(1):
+                    continue
+            if self._closed.is_set():
+                return
+
+
+@st.cache_resource
+def get_writer() -> ResponseWriter:
+    # New responses always belong to the current wave; closed waves are
+    # read-only.
+    store = storage.open_store(st.secrets, write=True, timeout=WRITE_TIMEOUT_SECONDS, wave=storage.current_wave(st.secrets))
+    # Rows left in the spool by a previous process are replayed as soon as the
+    # writer starts. A writer replaced by a cache rebuild keeps draining its
+    # own journal until the process exits.
+    writer = ResponseWriter(store, Spool(SPOOL_FILE))
+    atexit.register(writer.close)
+    return writer
 
 if "submitted" not in st.session_state:
     st.session_state["submitted"] = False
@@ -33,188 +116,16 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-st.markdown("""
-<style>
-    @import url('https://fonts.googleapis.com/css2?family=Archivo:wght@400;900&display=swap');
-
-    /* Global Body */
-    html, body, [class*="st-"], .stApp {
-        font-family: 'Archivo', sans-serif !important;
-        color: #8C7F72;
-    }
-
-    /* TITLE */
-    h1 {
-        font-family: 'Archivo', sans-serif !important;
-        font-weight: 900 !important;
-        color: #8C7F72 !important;
-        text-align: center;
-        text-transform: uppercase;
-        letter-spacing: 1px;
-        font-size: 2.2rem !important;
-    }
-
-    .subtitle {
-        text-align: center;
-        color: #8C7F72;
-        font-size: 0.85rem;
-        text-transform: uppercase;
-        letter-spacing: 3px;
-        margin-bottom: 50px;
-    }
-
-    /* QUESTION BOX (MSC Grey) */
-    .question-box {
-        background-color: #8C7F72;
-        padding: 22px 30px;
-        border-radius: 0px;
-        margin-top: 40px;
-        margin-bottom: 5px;
-    }
-
-    .question-text {
-        color: white !important;
-        font-weight: 900 !important;
-        font-size: 1.1rem;
-        text-transform: uppercase;
-        letter-spacing: 0.5px;
-        margin: 0;
-    }
-
-    .q-number {
-        color: #F8DE8D;
-        font-weight: 900;
-        margin-right: 15px;
-    }
-
-    /* --- SLIDER STYLING --- */
-
-    /* Pilnībā paslēpt visus ciparus iekš slidera (tooltip + 1/10) */
-    .stSlider span {
-        display: none !important;
-        opacity: 0 !important;
-        color: transparent !important;
-    }
-
-    /* Konteiners */
-    .stSlider [data-baseweb="slider"] {
-        margin-top: 10px;
-        margin-bottom: 10px;
-        background: transparent !important;
-    }
-
-    /* Viena plāna līnija – MSC pelēkā */
-    .stSlider [data-baseweb="slider"] > div > div > div {
-        background: #8C7F72 !important;      /* MSC Warm Grey */
-        height: 40px !important;
-        border-radius: 20px;
-        margin: 20px #8C7F72;
-    }
-
-    .stSlider [data-baseweb="slider"] > div > div > div > div:hover {
-        box-shadow: #F8DE8D80 0 0 0 0.2rem;      /* MSC Yellow */
-    }
+inject_css("app.css")
 
-    .stSlider [data-baseweb="slider"] > div > div > div > div {
-        background: #F8DE8D !important;      /* MSC Yellow */
-        width: 20px;
-        height: 20px;
-    }
-
-    .stSlider [data-baseweb="slider"] > div > div > div > div > div {
-        background: transparent !important;      /* MSC Warm Grey */
-        margin: -10px;
-        display: inline;
-        font-weight: 900 !important;
-        font-size: 1.1rem;
-        text-transform: uppercase;
-        letter-spacing: 0.5px;
-        color: #8C7F72 !important;
-    }
-
-    .stElementContainer {
-        width: 100%;
-    }
-
-    p, div{
-        font-family: 'Archivo', sans-serif !important;
-        font-weight: 900 !important;
-    }
-
-    /* Bumbiņa – MSC Yellow */
-    .stSlider [data-baseweb="thumb"] {
-        background-color: #F8DE8D !important; /* MSC Yellow */
-        border: 0 !important;
-        height: 20px !important;
-        width: 20px !important;
-        border-radius: 50% !important;
-        box-shadow: none !important;
-    }
-
-    /* Apakšējais cipars – vairs neizmantojam, bet klase paliek, ja nu vajag nākotnē */
-    .value-label {
-        display: none !important;
-    }
-
-    /* SUBMIT BUTTON */
-    .stButton {
-        display: flex;
-        justify-content: center;
-        margin-top: 60px;
-        margin-bottom: 80px;
-    }
-
-    .stButton > button {
-        background-color: transparent !important;
-        color: #8C7F72 !important;
-        font-family: 'Archivo', sans-serif !important;
-        font-weight: 900 !important;
-        border: 2px solid #F8DE8D !important;
-        border-radius: 0px !important;
-        padding: 12px 70px !important;
-        text-transform: uppercase;
-        letter-spacing: 2px;
-        transition: 0.3s;
-    }
-
-    .stButton > button:hover {
-        background-color: #F8DE8D !important;
-        border-color: #F8DE8D !important;
-    }
-
-    /* THANK YOU FULL-SCREEN FEEL */
-    .thank-you-area {
-        text-align: center;
-        margin-top: 80px;
-        padding: 80px 20px;
-        border: 2px solid #F8DE8D;
-    }
-
-    .thank-you-title {
-        color: #8C7F72 !important;
-        font-family: 'Archivo', sans-serif !important;
-        font-weight: 900 !important;
-        font-size: 2.2rem;
-        text-transform: uppercase;
-        margin-bottom: 10px;
-    }
-
-    /* Error message styling */
-    .required-error {
-        color: #b00020;
-        font-weight: 900;
-        text-align: center;
-        margin-top: 10px;
-    }
-</style>
-""", unsafe_allow_html=True)
+# Started on the first page view of a new process, not the first submission,
+# so rows a previous process left in the spool reach the sheet even if nobody
+# submits again.
+get_writer()
 
 col1, col2, col3 = st.columns([1, 1, 1])
 with col2:
-    if os.path.exists(LOGO_PATH):
-        st.image(LOGO_PATH, width=160)
-    else:
-        st.error("Logo missing")
+    logo(width="160px")
 
 st.title("Wellbeing Survey")
 st.markdown('<p class="subtitle">MSC Latvia Internal Feedback</p>', unsafe_allow_html=True)
@@ -230,24 +141,14 @@ if st.session_state["submitted"]:
     """, unsafe_allow_html=True)
     st.stop()
 
-def get_ws():
-    creds_info = st.secrets["gcp_service_account"]
-    scopes = ["https://www.googleapis.com/auth/spreadsheets"]
-    creds = Credentials.from_service_account_info(creds_info, scopes=scopes)
-    client = gspread.authorize(creds)
-    sheet_id = st.secrets["sheets"]["spreadsheet_id"]
-    ws_name = st.secrets["sheets"]["worksheet_name"]
-    return client.open_by_key(sheet_id).worksheet(ws_name)
-
 def save_response(row: dict):
-    ws = get_ws()
     answers = [
         row["q1"], row["q2"], row["q3"], row["q4"], row["q5"],
         row["q6"], row["q7"], row["q8"], row["q9"], row["q10"],
         row["q11"], row["q12"], row["q13"], row["q14"], row["q15"]
     ]
     values = [row["timestamp"], row["department"]] + answers
-    ws.append_row(values, value_input_option="USER_ENTERED")
+    get_writer().submit(values)
 
 
 def refined_question(number, text, key):
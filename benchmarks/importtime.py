@@ -0,0 +1,96 @@
+import os
+import re
+import ast
+import sys
+import json
+import argparse
+import subprocess
+
+# Usage, from the repository root:
+#   python -m benchmarks.importtime --budget-ms 1500
+# Runs the module-level imports of each entry script in a fresh interpreter
+# under -X importtime and reports their total cost and the slowest packages.
+# Fails if a script goes over budget or pulls in a dependency that should only
+# load on demand (exports, Sheets access).
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS = ["dashboard.py", "app.py"]
+DEFERRED = ["openpyxl", "reportlab", "gspread", "google.auth", "google.oauth2", "tenacity"]
+DEFAULT_BUDGET_MS = 1500.0
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def script_imports(path: str) -> str:
+    with open(path, encoding="utf-8") as fh:
+        tree = ast.parse(fh.read(), path)
+    return "\n".join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+def _importtime(code: str) -> list[tuple[int, int, str]]:
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    out = []
+    for line in proc.stderr.splitlines():
+        m = LINE.match(line)
+        if not m:
+            continue
+        _, cumulative, indent, name = m.groups()
+        out.append((len(indent), int(cumulative), name))
+    return out
+
+
+def measure(script: str, repeat: int = 3) -> dict:
+    # Cumulative microseconds of every top-level import, i.e. lines with no
+    # indentation in the -X importtime tree, leaving out what the interpreter
+    # imports at startup anyway. The fastest of repeat runs is kept, since
+    # noise only ever adds time.
+    startup = {name for _, _, name in _importtime("pass")}
+    code = script_imports(os.path.join(ROOT, script))
+    top, loaded = None, set()
+    for _ in range(repeat):
+        run = {}
+        for depth, cumulative, name in _importtime(code):
+            loaded.add(name)
+            if depth == 1 and name not in startup:
+                run[name] = run.get(name, 0) + cumulative
+        if top is None or sum(run.values()) < sum(top.values()):
+            top = run
+    total_ms = sum(top.values()) / 1000
+    deferred = sorted(d for d in DEFERRED if any(n == d or n.startswith(d + ".") for n in loaded))
+    slowest = sorted(top.items(), key=lambda kv: -kv[1])[:10]
+    return {
+        "script": script,
+        "total_ms": total_ms,
+        "slowest": [{"module": name, "ms": us / 1000} for name, us in slowest],
+        "deferred_loaded": deferred,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Check the startup import cost of the Streamlit entry scripts.")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="maximum import time per script")
+    parser.add_argument("--scripts", nargs="+", default=SCRIPTS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write JSON results here instead of stdout")
+    args = parser.parse_args(argv)
+
+    results = [measure(script, args.repeat) for script in args.scripts]
+    failed = False
+    for r in results:
+        over = r["total_ms"] > args.budget_ms
+        failed |= over or bool(r["deferred_loaded"])
+        status = "OVER BUDGET" if over else "ok"
+        print(f"{r['script']:<14} {r['total_ms']:8.1f} ms / {args.budget_ms:.0f} ms {status}", file=sys.stderr)
+        if r["deferred_loaded"]:
+            print(f"{'':<14} imported at startup: {', '.join(r['deferred_loaded'])}", file=sys.stderr)
+
+    text = json.dumps({"budget_ms": args.budget_ms, "results": results}, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
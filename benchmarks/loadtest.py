@@ -0,0 +1,215 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import sheets
+from benchmarks.run import _git_revision
+from survey_data import COMPANY_DEPARTMENTS, QUESTION_COLS
+
+# Usage, from the repository root:
+#   python -m benchmarks.loadtest --users 200 --concurrency 20 --latency 0.5 --failure-rate 0.05
+# Every simulated respondent runs the real app.py in its own AppTest session:
+# pick a department, move the 15 sliders, submit. Appends go to an in-memory
+# fake worksheet instead of Google Sheets. Afterwards the worksheet is compared
+# with what was submitted, once the writer has drained the spool.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "app.py")
+
+# AppTest swaps process-wide state (the runtime singleton, st.secrets) around
+# every run, so sessions take turns running the script, much as reruns share
+# one interpreter on a real server. Latencies include the wait for a turn;
+# the writer thread and the fake worksheet run concurrently throughout.
+_script_lock = threading.Lock()
+
+
+class FakeWorksheet:
+    # append_rows sleeps for about latency seconds, then fails with
+    # failure_rate before writing anything, or with ambiguous_rate after the
+    # rows were written (a timeout on a request that went through).
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0, ambiguous_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.ambiguous_rate = ambiguous_rate
+        self.rows: list[list] = []
+        self.calls = 0
+        self.failures = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def append_rows(self, rows: list[list], **kwargs) -> None:
+        with self._lock:
+            self.calls += 1
+            roll = self._rng.random()
+            delay = self.latency * self._rng.uniform(0.5, 1.5)
+        time.sleep(delay)
+        if roll < self.failure_rate:
+            with self._lock:
+                self.failures += 1
+            raise ConnectionError("injected failure")
+        with self._lock:
+            self.rows.extend(list(r) for r in rows)
+        if roll < self.failure_rate + self.ambiguous_rate:
+            with self._lock:
+                self.failures += 1
+            raise TimeoutError("injected failure after write")
+
+
+class FakeClient:
+    def __init__(self, ws: FakeWorksheet):
+        self._ws = ws
+
+    def open_by_key(self, key: str):
+        return self
+
+    def worksheet(self, name: str) -> FakeWorksheet:
+        return self._ws
+
+
+def _percentiles(values: list[float]) -> dict:
+    if not values:
+        return {}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50_ms": p50 * 1000, "p95_ms": p95 * 1000, "p99_ms": p99 * 1000, "max_ms": max(values) * 1000}
+
+
+def _spool_pending(path: str) -> int:
+    try:
+        with open(path + ".ack", encoding="utf-8") as fh:
+            acked = int(fh.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        acked = 0
+    if not os.path.exists(path):
+        return 0
+    with open(path, "rb") as fh:
+        return sum(1 for line in fh if line.endswith(b"\n") and int(line.split(b"\t", 1)[0]) > acked)
+
+
+def simulate_user(user: int, seed: int, timeout: float) -> dict:
+    rng = random.Random(seed * 100_003 + user)
+    dept = rng.choice(COMPANY_DEPARTMENTS)
+    answers = [rng.randint(1, 10) for _ in QUESTION_COLS]
+    reruns = []
+
+    def run(at: AppTest) -> None:
+        t0 = time.perf_counter()
+        with _script_lock:
+            at.run()
+        reruns.append(time.perf_counter() - t0)
+
+    at = AppTest.from_file(APP, default_timeout=timeout)
+    at.secrets["gcp_service_account"] = {"client_email": "loadtest"}
+    at.secrets["sheets"] = {"spreadsheet_id": "loadtest", "worksheet_name": "responses"}
+    run(at)
+    at.selectbox[0].set_value(dept)
+    run(at)
+    for slider, value in zip(at.slider, answers):
+        slider.set_value(value)
+    run(at)
+    submit = [b for b in at.button if b.label == "Submit Survey"]
+    if at.exception or not submit:
+        return {"row": (dept, *answers), "ok": False, "error": at.exception[0].message if at.exception else "no submit button", "reruns": reruns}
+    submit[0].click()
+    run(at)
+    ok = not at.exception and bool(at.session_state["submitted"])
+    return {"row": (dept, *answers), "ok": ok, "error": at.exception[0].message if at.exception else None, "submit": reruns[-1], "reruns": reruns}
+
+
+def run_load(users: int, concurrency: int, ws: FakeWorksheet, seed: int = 0, drain_timeout: float = 120.0, timeout: float = 60.0) -> dict:
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        sessions = list(pool.map(lambda u: simulate_user(u, seed, timeout), range(users)))
+    elapsed = time.perf_counter() - t0
+
+    submitted = [s for s in sessions if s["ok"]]
+    expected = Counter(s["row"] for s in submitted)
+    # The form returns as soon as the row is in the spool; wait for the writer
+    # thread to ship the rest.
+    deadline = time.monotonic() + drain_timeout
+    while _spool_pending("responses.spool") and time.monotonic() < deadline:
+        time.sleep(0.1)
+    drained = time.perf_counter() - t0
+
+    written = Counter((r[1], *(int(v) for v in r[2:])) for r in list(ws.rows))
+    return {
+        "users": users,
+        "concurrency": concurrency,
+        "latency_s": ws.latency,
+        "failure_rate": ws.failure_rate,
+        "ambiguous_rate": ws.ambiguous_rate,
+        "submitted": len(submitted),
+        "failed_sessions": users - len(submitted),
+        "submit": _percentiles([s["submit"] for s in submitted]),
+        "rerun": _percentiles([t for s in sessions for t in s["reruns"]]),
+        "submissions_per_second": len(submitted) / elapsed if elapsed else None,
+        "seconds_until_delivered": drained,
+        "append_calls": ws.calls,
+        "append_failures": ws.failures,
+        "rows_written": sum(written.values()),
+        "lost": sum((expected - written).values()),
+        "duplicated": sum((written - expected).values()),
+        "undelivered": _spool_pending("responses.spool"),
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test the survey form with concurrent simulated respondents.")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.3, help="mean seconds per fake append_rows call")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of appends failing before any row is written")
+    parser.add_argument("--ambiguous-rate", type=float, default=0.0, help="share of appends failing after the rows were written")
+    parser.add_argument("--drain-timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write JSON results here instead of stdout")
+    args = parser.parse_args(argv)
+
+    ws = FakeWorksheet(args.latency, args.failure_rate, args.ambiguous_rate, args.seed)
+    sheets.get_client = lambda *a, **kw: FakeClient(ws)
+    output = os.path.abspath(args.output) if args.output else None
+
+    # The writer's spool lives in the working directory, so each run starts
+    # from an empty one.
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            result = run_load(args.users, args.concurrency, ws, args.seed, args.drain_timeout)
+        finally:
+            st.cache_resource.clear()
+            os.chdir(cwd)
+
+    report = {
+        "meta": {"revision": _git_revision(), "python": platform.python_version(), "streamlit": st.__version__, "platform": platform.platform()},
+        "results": [result],
+    }
+    submit = result["submit"]
+    print(
+        f"{result['submitted']}/{args.users} submitted, submit p50 {submit.get('p50_ms', 0):.0f} ms "
+        f"p95 {submit.get('p95_ms', 0):.0f} ms p99 {submit.get('p99_ms', 0):.0f} ms, "
+        f"{result['submissions_per_second']:.1f}/s, lost {result['lost']}, duplicated {result['duplicated']}",
+        file=sys.stderr,
+    )
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
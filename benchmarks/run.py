@@ -0,0 +1,178 @@
+import sys
+import json
+import time
+import argparse
+import tempfile
+import platform
+import statistics
+import subprocess
+
+import numpy as np
+import pandas as pd
+
+import storage
+from benchmarks.synthetic import HEADER, generate_rows
+from exports import build_excel_bytes, build_pdf_bytes
+from survey_data import OVERALL_INDEX, QUESTION_COLS, Cube, FilterIndex, compute_category_scores, concat_rows, heatmap_cells, parse_rows, sort_by_time
+
+# Usage, from the repository root:
+#   python -m benchmarks.run --sizes 1000 10000 100000 --output bench.json
+# Each case is timed --repeat times; the JSON lists every timing plus the best
+# and median, so results from two releases can be diffed case by case.
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+EXCEL_MAX_ROWS = 1_048_575
+# Filling a store writes every row to disk and CsvStore.aggregate parses the
+# whole file in Python, so past this the store cases take minutes and
+# gigabytes without saying anything new.
+STORE_MAX_ROWS = 1_000_000
+SELECTED_DEPT = "Information Technology"
+SELECTED_Q = "q1"
+
+
+def _time(fn, repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+    return timings
+
+
+def _parse_all(n: int) -> tuple[pd.DataFrame, float]:
+    # Generation happens outside the timed region; only parse_rows and the
+    # delta concatenation are measured, chunk by chunk, as the loader does.
+    df, elapsed = pd.DataFrame(), 0.0
+    for rows in generate_rows(n):
+        t0 = time.perf_counter()
+        part = parse_rows(HEADER, rows)
+        df = part if df.empty else concat_rows(df, part)
+        elapsed += time.perf_counter() - t0
+    return df, elapsed
+
+
+def bench_size(n: int, repeat: int) -> list[dict]:
+    results = []
+
+    def record(name: str, timings: list[float] | None, skipped: str | None = None) -> None:
+        entry = {"case": name, "rows": n}
+        if skipped:
+            entry["skipped"] = skipped
+        else:
+            best = min(timings)
+            entry.update(seconds=timings, best=best, median=statistics.median(timings), rows_per_second=n / best if best else None)
+        results.append(entry)
+        print(f"{n:>10,} {name:<36} " + (skipped or f"{entry['best'] * 1000:10.2f} ms"), file=sys.stderr)
+
+    parse_timings = []
+    for _ in range(repeat):
+        raw, elapsed = _parse_all(n)
+        parse_timings.append(elapsed)
+    record("load_data.parse_rows", parse_timings)
+
+    record("compute_category_scores", _time(lambda: compute_category_scores(raw), repeat))
+    # In time order, undated rows last, as the loader holds it.
+    df = sort_by_time(compute_category_scores(raw))
+
+    record("cube.from_frame", _time(lambda: Cube.from_frame(df), repeat))
+    cube = Cube.from_frame(df)
+
+    record("filter.index_and_view", _time(lambda: FilterIndex(df).view(SELECTED_DEPT), repeat))
+    index = FilterIndex(df)
+    view = index.view(SELECTED_DEPT)
+    # A quarter in the middle of the history; the department frame is already
+    # cut, as it is after the first rerun.
+    dates = index.dates(SELECTED_DEPT)
+    middle = pd.Timestamp(dates[len(dates) // 2]) if len(dates) else pd.Timestamp("2024-01-01")
+    record("filter.date_range", _time(lambda: index.view(SELECTED_DEPT, middle, middle + pd.Timedelta(days=90)), repeat))
+    agg = cube.select(department=SELECTED_DEPT)
+
+    def overview():
+        stats = cube.stats()
+        cube.median(OVERALL_INDEX)
+        cube.trend(OVERALL_INDEX, "W-MON")
+        return stats
+
+    def question():
+        stats = cube.stats(by="department")
+        cube.median(SELECTED_Q, by="department")
+        cube.distribution(SELECTED_Q)
+        cube.trend(SELECTED_Q, "W-MON")
+        return stats
+
+    def department():
+        return cube.stats(by="department")["mean"][QUESTION_COLS]
+
+    def heatmap():
+        return heatmap_cells(cube.mean(by="department"), QUESTION_COLS)
+
+    record("tab.overview", _time(overview, repeat))
+    record("tab.question_explorer", _time(question, repeat))
+    record("tab.department_compare", _time(department, repeat))
+    record("tab.heatmap", _time(heatmap, repeat))
+    # A monthly trend over a range that starts and ends mid-month, read from
+    # the rollups once they exist, as on every rerun after the first.
+    cube.rollup("MS")
+    record("trend.monthly_range", _time(lambda: cube.trend(OVERALL_INDEX, "MS", SELECTED_DEPT, middle - pd.Timedelta(days=400), middle + pd.Timedelta(days=100)), repeat))
+
+    def excel(name: str, frame: pd.DataFrame, frame_agg: Cube) -> None:
+        if len(frame) > EXCEL_MAX_ROWS:
+            record(name, None, skipped="exceeds the Excel sheet row limit")
+        else:
+            record(name, _time(lambda: build_excel_bytes(frame, frame_agg, QUESTION_COLS, SELECTED_Q), repeat))
+
+    excel("export.build_excel_bytes", df, cube)
+    excel("export.build_excel_bytes.department", view, agg)
+    record("export.build_pdf_bytes", _time(lambda: build_pdf_bytes(cube, cube.median(OVERALL_INDEX)), repeat))
+
+    # Filtered aggregation inside each file backend; filling the stores is
+    # not timed.
+    if n > STORE_MAX_ROWS:
+        for name in ("csv", "sqlite"):
+            record(f"store.{name}.aggregate", None, skipped=f"over STORE_MAX_ROWS ({STORE_MAX_ROWS:,})")
+        return results
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, store in [("csv", storage.CsvStore(f"{tmp}/responses.csv")), ("sqlite", storage.SqliteStore(f"{tmp}/responses.db"))]:
+            for rows in generate_rows(n):
+                store.append(rows)
+            record(f"store.{name}.aggregate", _time(lambda: store.aggregate(SELECTED_DEPT), repeat))
+            store.close()
+    return results
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard data path on synthetic survey data.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="row counts to benchmark (up to 10000000)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write JSON results here instead of stdout")
+    args = parser.parse_args(argv)
+
+    report = {
+        "meta": {
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "results": [r for n in args.sizes for r in bench_size(n, args.repeat)],
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+from survey_data import CATEGORIES, COMPANY_DEPARTMENTS, QUESTION_COLS, concat_rows, parse_rows, sort_by_time
+
+HEADER = ["timestamp", "department"] + QUESTION_COLS
+
+# Rough head-count split; the generator draws departments with these weights.
+DEPARTMENT_WEIGHTS = [0.06, 0.24, 0.18, 0.10, 0.22, 0.12, 0.08]
+
+MALFORMED_ANSWERS = ["", "n/a", "11", "7.5", "0", "seven"]
+MALFORMED_TIMESTAMP = "not a date"
+
+CHUNK_ROWS = 100_000
+
+
+def _answers(rng: np.random.Generator, n: int, dept_codes: np.ndarray) -> np.ndarray:
+    # Each respondent has an overall mood, a per-category factor and per-answer
+    # noise, and each department has a fixed offset, so answers correlate
+    # within a category and departments differ the way real results do.
+    dept_offset = np.random.default_rng(7).normal(0.0, 0.6, len(COMPANY_DEPARTMENTS))
+    mood = rng.normal(0.0, 1.0, n)
+    base = 6.2 + dept_offset[dept_codes] + 0.8 * mood
+    out = np.empty((n, len(QUESTION_COLS)), dtype=np.int64)
+    col = 0
+    for qs in CATEGORIES.values():
+        factor = rng.normal(0.0, 1.0, n)
+        for _ in qs:
+            out[:, col] = np.rint(base + factor + rng.normal(0.0, 0.8, n))
+            col += 1
+    return np.clip(out, 1, 10)
+
+
+def generate_rows(n: int, seed: int = 0, start: str = "2024-01-01", months: int = 18, malformed: float = 0.002, chunk_rows: int = CHUNK_ROWS) -> Iterator[list[list[str]]]:
+    # Yields sheet-shaped rows (lists of strings, header excluded) in chunks, in
+    # timestamp order as the append-only sheet would hold them. The output only
+    # depends on the arguments.
+    rng = np.random.default_rng(seed)
+    t0 = np.datetime64(start, "us")
+    span_us = int(months * 30.44 * 24 * 3600 * 1e6)
+    offsets = np.sort(rng.integers(0, span_us, n))
+
+    for lo in range(0, n, chunk_rows):
+        hi = min(lo + chunk_rows, n)
+        m = hi - lo
+        dept_codes = rng.choice(len(COMPANY_DEPARTMENTS), size=m, p=DEPARTMENT_WEIGHTS)
+        ts = np.datetime_as_string(t0 + offsets[lo:hi].astype("timedelta64[us]"), unit="us").astype(object)
+        dept = np.array(COMPANY_DEPARTMENTS, dtype=object)[dept_codes]
+        answers = _answers(rng, m, dept_codes).astype(str).astype(object)
+
+        if malformed > 0:
+            bad = rng.random(answers.shape) < malformed
+            answers[bad] = rng.choice(MALFORMED_ANSWERS, size=int(bad.sum()))
+            ts[rng.random(m) < malformed] = MALFORMED_TIMESTAMP
+            dept[rng.random(m) < malformed / 2] = ""
+
+        yield np.column_stack([ts, dept, answers]).tolist()
+
+
+def generate_frame(n: int, seed: int = 0, **kwargs) -> pd.DataFrame:
+    # The parsed, typed frame the loader would hold for the same rows.
+    df = pd.DataFrame()
+    for rows in generate_rows(n, seed, **kwargs):
+        part = parse_rows(HEADER, rows)
+        df = part if df.empty else concat_rows(df, part)
+    return sort_by_time(df)
@@ -1,19 +1,21 @@
-import os
-import io
-from datetime import date
+import sys
 
+import numpy as np
 import pandas as pd
 import streamlit as st
 import altair as alt
 
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import cm
-
-import gspread
-from google.oauth2.service_account import Credentials
+import perf
+import storage
+from static_assets import inject_css, logo
+from exports import build_excel_bytes, build_pdf_bytes
+from survey_data import CATEGORIES, COMPANY_DEPARTMENTS, OVERALL_INDEX, Cube, FilterIndex, ResponseLoader, SNAPSHOT_FILE, append_in_time_order, heatmap_cells, refresh_all
 
 DATA_FILE = "responses.csv"
+EXPORT_CACHE_ENTRIES = 16
+DATA_TTL_SECONDS = 20
+TREND_MAX_POINTS = 120
+TREND_LEVELS = [("D", "daily"), ("W-MON", "weekly"), ("MS", "monthly"), ("QS", "quarterly")]
 
 MSC_YELLOW = "#F8DE8D"
 MSC_GREEN = "#00685E"
@@ -26,226 +28,11 @@ MSC_LIGHT_BLUE = "#8E9FBC"
 MSC_BLUE = "#135193"
 MSC_DARK_BLUE = "#1B365D"
 
-COMPANY_DEPARTMENTS = [
-    "Administration",
-    "Customer Invoicing",
-    "Finance & Accounting",
-    "Commercial Reporting & BI",
-    "Information Technology",
-    "OVA",
-    "Documentation, Pricing & Legal",
-]
-
-CATEGORIES = {
-    "Workload & Recovery": ["q1", "q2", "q3"],
-    "Team & Leadership": ["q4", "q5", "q6"],
-    "Motivation & Wellbeing": ["q7", "q8", "q9"],
-    "Work-Life Balance": ["q10", "q11", "q12"],
-    "Growth & Recognition": ["q13", "q14", "q15"],
-}
-
-@st.cache_data(ttl=20)
-def load_data():
-    creds_info = st.secrets["gcp_service_account"]
-    scopes = ["https://www.googleapis.com/auth/spreadsheets.readonly"]
-    creds = Credentials.from_service_account_info(creds_info, scopes=scopes)
-    client = gspread.authorize(creds)
-
-    sheet_id = st.secrets["sheets"]["spreadsheet_id"]
-    ws_name = st.secrets["sheets"]["worksheet_name"]
-    ws = client.open_by_key(sheet_id).worksheet(ws_name)
-
-    values = ws.get_all_values()
-    if len(values) < 2:
-        return pd.DataFrame()
-
-    header = values[0]
-    rows = values[1:]
-    return pd.DataFrame(rows, columns=header)
-
 st.set_page_config(page_title="MSC Latvia – Wellbeing Survey Dashboard", layout="wide")
 
-st.markdown(
-    f"""
-<style>
-@import url('https://fonts.googleapis.com/css2?family=Archivo:wght@400;700;900&display=swap');
-
-html, body, [class*="st-"], .stApp {{
-  font-family: 'Archivo', sans-serif !important;
-  font-weight: 900 !important;
-  color: {TEXT_COLOR};
-}}
-
-p, div{{
-  font-family: 'Archivo', sans-serif !important;
-  font-weight: 900 !important;
-}}
-
-span[data-testid="stIconMaterial"] {{
-  font-family: 'Material Symbols Rounded' !important;
-}}
-
-div[data-testid="stDataFrame"] * {{
-  font-family: 'Archivo', sans-serif !important;
-}}
-
-h1, h2, h3, h4 {{
-  font-family: 'Archivo', sans-serif !important;
-  font-weight: 900 !important;
-  text-transform: uppercase;
-  letter-spacing: 1px;
-  color: {TEXT_COLOR};
-}}
-
-div[data-testid="stMetricValue"] {{
-  color: {TEXT_COLOR} !important;
-  font-weight: 900 !important;
-}}
-
-section[data-testid="stSidebar"],
-div[data-testid="stSidebar"],
-section[data-testid="stSidebar"] > div,
-div[data-testid="stSidebar"] > div {{
-  background: {MSC_WARM_GREY} !important;
-  border-right: 2px solid {MSC_YELLOW} !important;
-}}
-
-div[data-testid="stSidebar"] *,
-section[data-testid="stSidebar"] * {{
-  color: #ffffff !important;
-}}
-
-div[data-testid="stSidebar"] a,
-div[data-testid="stSidebar"] a:visited,
-section[data-testid="stSidebar"] a,
-section[data-testid="stSidebar"] a:visited {{
-  color: #ffffff !important;
-}}
-
-div[data-testid="stSidebar"] [data-testid="stMarkdownContainer"] *,
-section[data-testid="stSidebar"] [data-testid="stMarkdownContainer"] * {{
-  color: #ffffff !important;
-}}
-
-div[data-testid="stSidebar"] label,
-section[data-testid="stSidebar"] label {{
-  color: #ffffff !important;
-}}
-
-div[data-testid="stSidebar"] h1,
-div[data-testid="stSidebar"] h2,
-div[data-testid="stSidebar"] h3,
-section[data-testid="stSidebar"] h1,
-section[data-testid="stSidebar"] h2,
-section[data-testid="stSidebar"] h3 {{
-  color: #ffffff !important;
-}}
-
-div[data-testid="stSidebar"] div[data-baseweb="select"] > div,
-div[data-testid="stSidebar"] div[data-baseweb="input"] > div,
-section[data-testid="stSidebar"] div[data-baseweb="select"] > div,
-section[data-testid="stSidebar"] div[data-baseweb="input"] > div {{
-  background: #ffffff22 !important;
-  border-color: #ffffff55 !important;
-}}
-
-div[data-testid="stSidebar"] div[data-baseweb="select"] span,
-section[data-testid="stSidebar"] div[data-baseweb="select"] span {{
-  color: #ffffff !important;
-}}
-
-div[data-testid="stSidebar"] div[data-baseweb="select"] svg,
-section[data-testid="stSidebar"] div[data-baseweb="select"] svg {{
-  color: #ffffff !important;
-}}
-
-div[data-testid="stSidebar"] .stDateInput input,
-section[data-testid="stSidebar"] .stDateInput input {{
-  background: #ffffff22 !important;
-  border-color: #ffffff55 !important;
-  color: #ffffff !important;
-}}
-
-div[data-testid="stSidebar"] input::placeholder,
-section[data-testid="stSidebar"] input::placeholder {{
-  color: #ffffffcc !important;
-}}
-
-div[data-testid="stSidebar"] div[data-baseweb="popover"],
-section[data-testid="stSidebar"] div[data-baseweb="popover"] {{
-  color: {BLACK} !important;
-}}
-
-div[data-testid="stSidebar"] div[role="listbox"] *,
-section[data-testid="stSidebar"] div[role="listbox"] * {{
-  color: {BLACK} !important;
-}}
-
-hr {{
-  border: none;
-  border-top: 2px solid {MSC_YELLOW};
-  margin: 1.2rem 0;
-}}
-
-button[kind="primary"] {{
-  background: {MSC_YELLOW} !important;
-  border-color: {MSC_YELLOW} !important;
-  color: {BLACK} !important;
-}}
-
-button[kind="secondary"] {{
-  border-color: #ffffff55 !important;
-  color: #ffffff !important;
-}}
-
-div[data-testid="collapsedControl"] button,
-div[data-testid="collapsedControl"] {{
-  background: transparent !important;
-}}
-
-div[data-testid="collapsedControl"] button {{
-  background: {MSC_YELLOW} !important;
-  border: 2px solid {MSC_YELLOW} !important;
-  border-radius: 10px !important;
-  width: 44px !important;
-  height: 38px !important;
-  padding: 0 !important;
-  display: inline-flex !important;
-  align-items: center !important;
-  justify-content: center !important;
-}}
-
-div[data-testid="collapsedControl"] button svg {{
-  display: none !important;
-}}
-
-div[data-testid="collapsedControl"] button::before {{
-  content: "✕";
-  color: {BLACK} !important;
-  font-weight: 900 !important;
-  font-size: 22px !important;
-  line-height: 1 !important;
-}}
-
-a, a:visited {{
-  color: {TEXT_COLOR};
-}}
-</style>
-""",
-    unsafe_allow_html=True,
-)
+profile = perf.start("dashboard")
 
-def _logo_path() -> str | None:
-    candidates = [
-        os.path.join("assets", "msc_logo_1.png"),
-        os.path.join("assets", "msc_logo.png"),
-        "msc_logo_1.png",
-        "msc_logo.png",
-    ]
-    for p in candidates:
-        if os.path.exists(p):
-            return p
-    return None
+inject_css("dashboard.css")
 
 @alt.theme.register("msc_theme", enable=True)
 def _msc_altair_theme():
@@ -276,43 +63,69 @@ with top_left:
     st.title("Wellbeing Survey Dashboard")
     st.caption("MSC Latvia Internal Feedback — interactive overview")
 with top_right:
-    lp = _logo_path()
-    if lp:
-        st.image(lp, use_container_width=True)
-
-@st.cache_data(ttl=20)
-def load_data() -> pd.DataFrame:
-    creds_info = st.secrets["gcp_service_account"]
-    scopes = ["https://www.googleapis.com/auth/spreadsheets.readonly"]
-    creds = Credentials.from_service_account_info(creds_info, scopes=scopes)
-    client = gspread.authorize(creds)
-
-    sheet_id = st.secrets["sheets"]["spreadsheet_id"]
-    ws_name = st.secrets["sheets"]["worksheet_name"]
-    ws = client.open_by_key(sheet_id).worksheet(ws_name)
+    logo()
+
+WAVES = storage.waves(st.secrets)
+CURRENT_WAVE = storage.current_wave(st.secrets)
+
+@st.cache_resource
+def get_loader(wave: str | None) -> ResponseLoader:
+    # One loader per wave, kept for the life of the process. Closed waves are
+    # read once (or restored from their snapshot) and never fetched again.
+    # Every dashboard process on the host shares the snapshot, so the store is
+    # read by one of them per DATA_TTL_SECONDS however many are running.
+    return ResponseLoader(
+        storage.open_store(st.secrets, wave=wave),
+        snapshot_path=storage.wave_path(SNAPSHOT_FILE, wave),
+        closed=wave != CURRENT_WAVE,
+        shared_max_age=DATA_TTL_SECONDS,
+    )
+
+@st.cache_resource(max_entries=4)
+def combine_waves(key: tuple, _parts: tuple):
+    perf.cache_miss("combine_waves")
+    frames = [df for df, _, _ in _parts if not df.empty]
+    df = frames[0] if frames else pd.DataFrame()
+    for other in frames[1:]:
+        df = append_in_time_order(df, other)
+    # Merged onto the first wave's cube, so trend rollups already built for
+    # the waves are extended rather than rebuilt.
+    cube = _parts[0][1]
+    for _, part, _ in _parts[1:]:
+        cube = cube.merge(part)
+    return df, cube, FilterIndex(df)
+
+@st.cache_resource(ttl=DATA_TTL_SECONDS)
+def load_data(waves: tuple):
+    # The loaders live across cache expiries, so each refresh only pulls the
+    # rows appended to the current wave since the previous one; the selected
+    # waves are refreshed concurrently. The result is shared by all sessions
+    # without copying, so callers must not modify it.
+    perf.cache_miss("load_data")
+    parts = tuple(refresh_all([get_loader(w) for w in waves]))
+    version = tuple((w, v) for w, (_, _, v) in zip(waves, parts))
+    # Unchanged waves give the same version, so the combined frame is reused.
+    df, cube, filter_index = combine_waves(version, parts)
+    return df, cube, filter_index, version, {w: c for w, (_, c, _) in zip(waves, parts)}
 
-    values = ws.get_all_values()
-    if len(values) < 2:
-        return pd.DataFrame()
 
-    header = [c.strip() for c in values[0]]
-    rows = values[1:]
-    df = pd.DataFrame(rows, columns=header)
-
-    if "timestamp" in df.columns:
-        df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
-
-    for i in range(1, 16):
-        col = f"q{i}"
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
-
-    return df
+with st.sidebar:
+    st.header("Filters")
 
+    selected_waves = [CURRENT_WAVE]
+    if len(WAVES) > 1:
+        selected_waves = st.multiselect("Survey waves", options=WAVES, default=[CURRENT_WAVE]) or [CURRENT_WAVE]
+        selected_waves = [w for w in WAVES if w in selected_waves]
 
-df = load_data()
+with perf.stage("load_data", cache="load_data"):
+    df, cube, filter_index, data_version, wave_cubes = load_data(tuple(selected_waves))
 if df.empty:
-    st.error(f"Can't find/read `{DATA_FILE}`. Make sure the file is in the same folder as `dashboard.py`.")
+    if CURRENT_WAVE is None:
+        st.error(f"Can't find/read `{DATA_FILE}`. Make sure the file is in the same folder as `dashboard.py`.")
+    else:
+        # A wave that has just opened has no responses yet; that is not an error.
+        hint = " Pick an earlier wave in the sidebar to see its results." if len(WAVES) > 1 else ""
+        st.info(f"No responses yet for {', '.join(selected_waves)}.{hint}")
     st.stop()
 
 question_cols = [c for c in df.columns if c.lower().startswith("q") and c[1:].isdigit()]
@@ -322,22 +135,19 @@ if not question_cols:
     st.error("No question columns found in the CSV file (`q1`, `q2`, ...).")
     st.stop()
 
-for c in question_cols:
-    df[c] = pd.to_numeric(df[c], errors="coerce")
-
 has_department = "department" in df.columns
-has_survey_date = "survey_date" in df.columns and df["survey_date"].notna().any()
+# Rows are sorted by time, so the first and last dated rows bound the range.
+survey_dates = filter_index.dates()
+has_survey_date = len(survey_dates) > 0
 
 with st.sidebar:
-    st.header("Filters")
-
     selected_dept = "All"
     if has_department:
         selected_dept = st.selectbox("Select department", options=["All"] + COMPANY_DEPARTMENTS, index=0)
 
     if has_survey_date:
-        min_d = df["survey_date"].dropna().min()
-        max_d = df["survey_date"].dropna().max()
+        min_d = pd.Timestamp(survey_dates[0]).date()
+        max_d = pd.Timestamp(survey_dates[-1]).date()
         dr = st.date_input("Date range", value=(min_d, max_d))
         if isinstance(dr, tuple) and len(dr) == 2:
             start_d, end_d = dr
@@ -346,69 +156,95 @@ with st.sidebar:
         if start_d > end_d:
             start_d, end_d = end_d, start_d
 
+        trend_choice = st.segmented_control(
+            "Trend granularity",
+            options=["auto"] + [label for _, label in TREND_LEVELS],
+            default="auto",
+            format_func=str.capitalize,
+            help="Auto picks the finest level that still fits the chart.",
+        )
+
     st.divider()
 
     selected_q = st.selectbox("Question", options=question_cols, index=0)
 
     if st.button("Refresh data", type="primary"):
-        st.cache_data.clear()
+        load_data.clear()
         st.rerun()
 
-fdf = df.copy()
-
-if has_department and selected_dept != "All":
-    fdf = fdf[fdf["department"] == selected_dept]
-
-if has_survey_date:
-    fdf = fdf[(fdf["survey_date"].notna()) & (fdf["survey_date"] >= start_d) & (fdf["survey_date"] <= end_d)]
-
-def compute_category_scores(df_in: pd.DataFrame) -> pd.DataFrame:
-    out = df_in.copy()
-    for cat, qs in CATEGORIES.items():
-        cols = [q for q in qs if q in out.columns]
-        if cols:
-            out[cat] = out[cols].mean(axis=1, skipna=True)
-    cat_cols = [c for c in CATEGORIES.keys() if c in out.columns]
-    if cat_cols:
-        out["Overall Index"] = out[cat_cols].mean(axis=1, skipna=True)
-    return out
-
-adf = compute_category_scores(fdf)
-q_series = adf[selected_q].dropna() if selected_q in adf.columns else pd.Series(dtype=float)
-
-def style_worst_per_department_row(df_in: pd.DataFrame):
-    df_style = df_in.copy()
-    num_cols = df_style.select_dtypes(include="number").columns.tolist()
+    show_perf = st.toggle("Performance", help="Show how long each stage of this page took to compute.")
+    perf_panel = st.container()
+
+# Charts only ever receive these small aggregates, never response rows, so the
+# Vega-Lite payload stays the same size however many answers there are. Long
+# date ranges are rolled up to weeks, months or quarters to stay readable, and
+# those come from the cube's rollups rather than from days.
+def trend_level(agg: Cube, choice: str | None = None) -> tuple[str, str]:
+    for freq, label in TREND_LEVELS:
+        if label == choice:
+            return freq, label
+    days = agg.n.index.get_level_values("day").dropna()
+    span = (days.max() - days.min()).days + 1 if len(days) else 0
+    for (freq, label), period_days in zip(TREND_LEVELS, [1, 7, 30, 91]):
+        if span / period_days <= TREND_MAX_POINTS:
+            return freq, label
+    return TREND_LEVELS[-1]
+
+with perf.stage("filter"):
+    start_d, end_d = (start_d, end_d) if has_survey_date else (None, None)
+    dept_filter = selected_dept if has_department and selected_dept != "All" else None
+
+    # Every figure on every tab comes from the cube, which is already aggregated
+    # per (department, day): averages, counts and ranges from its sums, medians
+    # and the histogram from its per-value counts. Individual responses are
+    # only read for the Excel export.
+    ccube = cube.select(department=dept_filter, start=start_d, end=end_d)
+    n_rows = ccube.responses()
+    # Identifies the filtered aggregate, for caching anything derived from it.
+    agg_key = (data_version, selected_dept, start_d, end_d)
+    overall_stats = ccube.stats()
+    dept_stats = ccube.stats(by="department")
+    trend_freq, trend_label = trend_level(ccube, trend_choice if has_survey_date else None)
+
+WORST_CELL_CSS = f"background-color: {MSC_RED}; color: white; font-weight: 800;"
+
+def worst_per_row_css(df_in: pd.DataFrame) -> pd.DataFrame:
+    # One comparison of the department x question matrix against its row
+    # minima; NaN never equals the minimum, so empty cells stay unstyled.
+    num_cols = df_in.select_dtypes(include="number").columns.tolist()
+    css = pd.DataFrame("", index=df_in.index, columns=df_in.columns)
+    if num_cols:
+        values = df_in[num_cols]
+        is_min = values.eq(values.min(axis=1), axis=0).to_numpy()
+        css[num_cols] = np.where(is_min, WORST_CELL_CSS, "")
+    return css
+
+@st.cache_data(max_entries=EXPORT_CACHE_ENTRIES, show_spinner=False)
+def get_worst_per_row_css(key: tuple, _df_in: pd.DataFrame) -> pd.DataFrame:
+    perf.cache_miss("worst_per_row_css")
+    return worst_per_row_css(_df_in)
+
+def style_worst_per_department_row(df_in: pd.DataFrame, css: pd.DataFrame | None = None):
+    num_cols = df_in.select_dtypes(include="number").columns.tolist()
     if not num_cols:
-        return df_style.style
-    row_mins = df_style[num_cols].min(axis=1)
-    def _apply_row(row: pd.Series):
-        styles = [""] * len(row)
-        rmin = row_mins[row.name]
-        for i, col in enumerate(row.index):
-            if col in num_cols:
-                v = row[col]
-                if pd.notna(v) and pd.notna(rmin) and v == rmin:
-                    styles[i] = f"background-color: {MSC_RED}; color: white; font-weight: 800;"
-        return styles
-    return df_style.style.apply(_apply_row, axis=1).format({c: "{:.2f}" for c in num_cols})
+        return df_in.style
+    css = worst_per_row_css(df_in) if css is None else css
+    return df_in.style.apply(lambda _: css, axis=None).format({c: "{:.2f}" for c in num_cols})
 
 tab_overview, tab_question, tab_dept, tab_heatmap, tab_export = st.tabs(
     ["Overview", "Question Explorer", "Department Compare", "Heatmap", "Export"]
 )
 
-with tab_overview:
+with tab_overview, perf.stage("tab.overview"):
     st.subheader("Executive summary")
 
-    n_rows = len(adf)
-
     c1, c2, c3, c4 = st.columns(4)
     c1.metric("Responses (after filters)", f"{n_rows:,}")
 
-    if "Overall Index" in adf.columns and adf["Overall Index"].notna().any():
-        c2.metric("Overall Index (avg)", f"{adf['Overall Index'].mean():.2f}")
-        c3.metric("Overall Index (median)", f"{adf['Overall Index'].median():.2f}")
-        c4.metric("Overall Index (min / max)", f"{adf['Overall Index'].min():.2f} / {adf['Overall Index'].max():.2f}")
+    if OVERALL_INDEX in ccube.measures and overall_stats["count"][OVERALL_INDEX] > 0:
+        c2.metric("Overall Index (avg)", f"{overall_stats['mean'][OVERALL_INDEX]:.2f}")
+        c3.metric("Overall Index (median)", f"{ccube.median(OVERALL_INDEX):.2f}")
+        c4.metric("Overall Index (min / max)", f"{overall_stats['min'][OVERALL_INDEX]:.2f} / {overall_stats['max'][OVERALL_INDEX]:.2f}")
     else:
         c2.metric("Overall Index (avg)", "—")
         c3.metric("Overall Index (median)", "—")
@@ -416,9 +252,9 @@ with tab_overview:
 
     st.markdown("---")
 
-    cat_cols = [c for c in CATEGORIES.keys() if c in adf.columns]
+    cat_cols = [c for c in CATEGORIES.keys() if c in ccube.measures]
     if cat_cols and n_rows > 0:
-        cat_avg = pd.DataFrame({"Category": cat_cols, "Average": [adf[c].mean() for c in cat_cols]}).dropna()
+        cat_avg = pd.DataFrame({"Category": cat_cols, "Average": overall_stats["mean"][cat_cols].to_numpy()}).dropna()
 
         st.subheader("Category averages (after filters)")
         cat_chart = (
@@ -436,11 +272,27 @@ with tab_overview:
     else:
         st.info("Insufficient data to display category summary (check if CSV has q1..q15).")
 
-    if has_survey_date and "Overall Index" in adf.columns:
-        tdf = adf[["survey_date", "Overall Index"]].dropna()
+    if len(selected_waves) > 1:
+        # Same department and date filters, one row per wave.
+        st.subheader("Wave comparison")
+        wave_rows = []
+        for wave in selected_waves:
+            wcube = wave_cubes[wave].select(department=dept_filter, start=start_d, end=end_d)
+            wmean = wcube.stats()["mean"]
+            wave_rows.append({
+                "Wave": wave,
+                "Responses": wcube.responses(),
+                "Overall Index (avg)": wmean.get(OVERALL_INDEX, np.nan),
+                "Overall Index (median)": wcube.median(OVERALL_INDEX),
+                **{c: wmean.get(c, np.nan) for c in cat_cols},
+            })
+        wave_df = pd.DataFrame(wave_rows).set_index("Wave")
+        st.dataframe(wave_df.style.format({c: "{:.2f}" for c in wave_df.columns if c != "Responses"}), use_container_width=True)
+
+    if has_survey_date and OVERALL_INDEX in ccube.measures:
+        tdf = cube.trend(OVERALL_INDEX, trend_freq, dept_filter, start_d, end_d)
         if not tdf.empty:
-            st.subheader("Overall Index trend (daily average)")
-            tdf = tdf.groupby("survey_date", as_index=False)["Overall Index"].mean().rename(columns={"Overall Index": "avg"})
+            st.subheader(f"Overall Index trend ({trend_label} average)")
             line = (
                 alt.Chart(tdf)
                 .mark_line(point=alt.OverlayMarkDef(filled=True), color=MSC_YELLOW, strokeWidth=3)
@@ -453,14 +305,15 @@ with tab_overview:
             )
             st.altair_chart(line, use_container_width=True)
 
-with tab_question:
+with tab_question, perf.stage("tab.question_explorer"):
     st.subheader(f"Question Explorer — {selected_q}")
 
     colA, colB, colC, colD = st.columns(4)
-    colA.metric("N (valid)", f"{len(q_series):,}")
-    colB.metric("Average", f"{q_series.mean():.2f}" if not q_series.empty else "—")
-    colC.metric("Median", f"{q_series.median():.0f}" if not q_series.empty else "—")
-    colD.metric("Min / Max", f"{int(q_series.min())} / {int(q_series.max())}" if not q_series.empty else "—")
+    q_n = int(overall_stats["count"].get(selected_q, 0))
+    colA.metric("N (valid)", f"{q_n:,}")
+    colB.metric("Average", f"{overall_stats['mean'][selected_q]:.2f}" if q_n else "—")
+    colC.metric("Median", f"{ccube.median(selected_q):.0f}" if q_n else "—")
+    colD.metric("Min / Max", f"{int(overall_stats['min'][selected_q])} / {int(overall_stats['max'][selected_q])}" if q_n else "—")
 
     st.markdown("---")
 
@@ -468,8 +321,12 @@ with tab_question:
 
     with left:
         st.markdown("#### Distribution by department")
-        if has_department and not adf.empty:
-            by_dept = adf.groupby("department", dropna=False)[selected_q].agg(["count", "mean", "median"]).reset_index()
+        if has_department and q_n:
+            by_dept = pd.DataFrame({
+                "count": dept_stats["count"][selected_q],
+                "mean": dept_stats["mean"][selected_q],
+                "median": ccube.median(selected_q, by="department"),
+            }).rename_axis("department").reset_index()
             by_dept = by_dept[by_dept["count"] > 0]
 
             if by_dept.empty:
@@ -498,28 +355,28 @@ with tab_question:
 
     with right:
         st.markdown("#### Response distribution (histogram)")
-        if q_series.empty:
+        if not q_n:
             st.info("No data for the selected filters.")
         else:
-            hist_df = adf[[selected_q]].dropna().rename(columns={selected_q: "Score"})
+            dist = ccube.distribution(selected_q)
+            hist_df = pd.DataFrame({"Score": dist.index.astype(int), "Count": dist.to_numpy()})
             hist = (
                 alt.Chart(hist_df)
                 .mark_bar(color=MSC_YELLOW, cornerRadiusTopLeft=6, cornerRadiusTopRight=6)
                 .configure_axis(labelFont="Archivo", titleFont="Archivo", labelFontWeight=900, titleFontWeight=900)
                 .encode(
                     x=alt.X("Score:O", title="Score (1–10)"),
-                    y=alt.Y("count():Q", title="Count"),
-                    tooltip=[alt.Tooltip("Score:O", title="Score"), alt.Tooltip("count():Q", title="Count")],
+                    y=alt.Y("Count:Q", title="Count"),
+                    tooltip=[alt.Tooltip("Score:O", title="Score"), alt.Tooltip("Count:Q", title="Count")],
                 )
                 .properties(height=360)
             )
             st.altair_chart(hist, use_container_width=True)
 
-    if has_survey_date and selected_q in adf.columns:
-        tdf = adf[["survey_date", selected_q]].dropna()
+    if has_survey_date and selected_q in ccube.measures:
+        tdf = cube.trend(selected_q, trend_freq, dept_filter, start_d, end_d)
         if not tdf.empty:
-            st.markdown("#### Trend over time (daily average)")
-            tdf = tdf.groupby("survey_date", as_index=False)[selected_q].mean().rename(columns={selected_q: "avg"})
+            st.markdown(f"#### Trend over time ({trend_label} average)")
             line = (
                 alt.Chart(tdf)
                 .mark_line(point=alt.OverlayMarkDef(filled=True), color=MSC_YELLOW, strokeWidth=3)
@@ -532,21 +389,21 @@ with tab_question:
             )
             st.altair_chart(line, use_container_width=True)
 
-with tab_dept:
+with tab_dept, perf.stage("tab.department_compare"):
     st.subheader("Department comparison")
 
     if not has_department:
         st.info("The CSV file does not contain a `department` column.")
-    elif adf.empty:
+    elif n_rows == 0:
         st.info("No data after filters.")
     else:
         metric_mode = st.radio("Compare", ["Overall Index", "Category scores", "All questions (avg)"], horizontal=True)
 
         if metric_mode == "Overall Index":
-            if "Overall Index" not in adf.columns:
+            if OVERALL_INDEX not in ccube.measures:
                 st.info("No `Overall Index` found (check if categories contain q1..q15).")
             else:
-                comp = adf.groupby("department", as_index=False)["Overall Index"].mean().dropna()
+                comp = dept_stats["mean"][[OVERALL_INDEX]].dropna().reset_index()
                 comp = comp.sort_values("Overall Index", ascending=False)
                 comp_disp = comp.rename(columns={"department": "Department"})
 
@@ -565,11 +422,11 @@ with tab_dept:
                 st.dataframe(comp_disp, use_container_width=True)
 
         elif metric_mode == "Category scores":
-            cat_cols = [c for c in CATEGORIES.keys() if c in adf.columns]
+            cat_cols = [c for c in CATEGORIES.keys() if c in ccube.measures]
             if not cat_cols:
                 st.info("No category columns found (check q1..q15).")
             else:
-                dept_cat = adf.groupby("department", as_index=False)[cat_cols].mean()
+                dept_cat = dept_stats["mean"][cat_cols].reset_index()
                 dept_cat_disp = dept_cat.rename(columns={"department": "Department"})
                 dept_cat_melt = dept_cat_disp.melt("Department", var_name="Category", value_name="Average").dropna()
 
@@ -588,38 +445,36 @@ with tab_dept:
                 st.dataframe(dept_cat_disp, use_container_width=True)
 
         else:
-            dept_q = adf.groupby("department", as_index=False)[question_cols].mean()
+            dept_q = dept_stats["mean"][question_cols].reset_index()
             dept_q_disp = dept_q.rename(columns={"department": "Department"})
-            st.dataframe(style_worst_per_department_row(dept_q_disp), use_container_width=True)
+            with perf.stage("worst_per_row_css", cache="worst_per_row_css"):
+                css = get_worst_per_row_css(agg_key, dept_q_disp)
+            st.dataframe(style_worst_per_department_row(dept_q_disp, css), use_container_width=True)
 
-with tab_heatmap:
+with tab_heatmap, perf.stage("tab.heatmap"):
     st.subheader("Heatmap — questions × departments (average)")
 
     if not has_department:
         st.info("The CSV file does not contain a `department` column.")
-    elif adf.empty:
+    elif n_rows == 0:
         st.info("No data available for the applied filters.")
     else:
-        heat = (
-            adf.melt(id_vars=["department"], value_vars=question_cols, var_name="Question", value_name="Score")
-            .dropna(subset=["Score"])
-            .groupby(["department", "Question"], as_index=False)["Score"]
-            .mean()
-        )
+        heat_disp = heatmap_cells(dept_stats["mean"], question_cols)
 
-        if heat.empty:
+        if heat_disp.empty:
             st.info("Insufficient data to generate the heatmap with the applied filters.")
         else:
-            heat["department"] = pd.Categorical(heat["department"], categories=COMPANY_DEPARTMENTS, ordered=True)
-            heat = heat.sort_values(["department", "Question"]).dropna(subset=["department"])
-            heat_disp = heat.rename(columns={"department": "Department"})
+            # Rects and text labels share one base chart, so the cells are
+            # embedded in the spec once.
+            base = alt.Chart(heat_disp).encode(
+                x=alt.X("Question:N", title="Question", sort=question_cols, axis=alt.Axis(labelAngle=0, labelPadding=10, labelFont="Archivo", labelFontWeight=900, titleFont="Archivo", titleFontWeight=900)),
+                y=alt.Y("Department:N", title="Department", sort=COMPANY_DEPARTMENTS, axis=alt.Axis(labelPadding=10, labelFont="Archivo", labelFontWeight=900, titleFont="Archivo", titleFontWeight=900)),
+            )
 
             hm = (
-                alt.Chart(heat_disp)
+                base
                 .mark_rect(stroke="#FFFFFF", strokeWidth=0.8, cornerRadius=6)
                 .encode(
-                    x=alt.X("Question:N", title="Question", sort=question_cols, axis=alt.Axis(labelAngle=0, labelPadding=10, labelFont="Archivo", labelFontWeight=900, titleFont="Archivo", titleFontWeight=900)),
-                    y=alt.Y("Department:N", title="Department", sort=COMPANY_DEPARTMENTS, axis=alt.Axis(labelPadding=10, labelFont="Archivo", labelFontWeight=900, titleFont="Archivo", titleFontWeight=900)),
                     color=alt.Color(
                         "Score:Q",
                         title="Average",
@@ -636,11 +491,9 @@ with tab_heatmap:
             )
 
             labels = (
-                alt.Chart(heat_disp)
+                base
                 .mark_text(font="Archivo", fontSize=11, fontWeight=700)
                 .encode(
-                    x=alt.X("Question:N", sort=question_cols),
-                    y=alt.Y("Department:N", sort=COMPANY_DEPARTMENTS),
                     text=alt.Text("Score:Q", format=".1f"),
                     color=alt.condition("datum.Score >= 7.0", alt.value("white"), alt.value(BLACK)),
                 )
@@ -648,124 +501,64 @@ with tab_heatmap:
 
             st.altair_chart(hm + labels, use_container_width=True)
 
-def build_excel_bytes(df_filtered: pd.DataFrame, df_scored: pd.DataFrame) -> bytes:
-    output = io.BytesIO()
-    df_filtered_out = df_filtered.rename(columns={"department": "Department"}).copy() if "department" in df_filtered.columns else df_filtered.copy()
-    df_scored_out = df_scored.rename(columns={"department": "Department"}).copy() if "department" in df_scored.columns else df_scored.copy()
-
-    with pd.ExcelWriter(output, engine="openpyxl") as writer:
-        df_filtered_out.to_excel(writer, index=False, sheet_name="Filtered Raw")
-
-        q_avg = df_scored_out[question_cols].mean().to_frame("Average").reset_index().rename(columns={"index": "Question"})
-        q_avg.to_excel(writer, index=False, sheet_name="Question Avg")
-
-        if has_department:
-            cols = [selected_q] + (["Overall Index"] if "Overall Index" in df_scored_out.columns else [])
-            cols = [c for c in cols if c in df_scored_out.columns]
-            if cols:
-                dept_avg = df_scored.groupby("department", as_index=False)[cols].mean()
-                dept_avg = dept_avg.rename(columns={"department": "Department"})
-                dept_avg.to_excel(writer, index=False, sheet_name="Dept Avg")
-
-        cat_cols = [c for c in CATEGORIES.keys() if c in df_scored_out.columns]
-        if cat_cols:
-            cat_avg = df_scored_out[cat_cols].mean().to_frame("Average").reset_index().rename(columns={"index": "Category"})
-            cat_avg.to_excel(writer, index=False, sheet_name="Category Avg")
-
-    return output.getvalue()
-
-def build_pdf_bytes(df_scored: pd.DataFrame) -> bytes:
-    buf = io.BytesIO()
-    c = canvas.Canvas(buf, pagesize=A4)
-    w, h = A4
-
-    font_bold = "Helvetica-Bold"
-    font_regular = "Helvetica"
-
-    c.setFont(font_bold, 16)
-    c.drawString(2 * cm, h - 2.2 * cm, "MSC Latvia – Wellbeing Survey (Summary)")
-
-    c.setFont(font_regular, 10)
-    c.drawString(2 * cm, h - 2.9 * cm, f"Generated: {date.today().isoformat()}")
-    c.drawString(2 * cm, h - 3.5 * cm, f"Rows (after filters): {len(df_scored)}")
-
-    y = h - 5.2 * cm
-
-    if "Overall Index" in df_scored.columns and df_scored["Overall Index"].notna().any():
-        c.setFont(font_bold, 12)
-        c.drawString(2 * cm, y, "Overall Index")
-        y -= 0.6 * cm
-        c.setFont(font_regular, 10)
-        c.drawString(2 * cm, y, f"Average: {df_scored['Overall Index'].mean():.2f}")
-        y -= 0.5 * cm
-        c.drawString(2 * cm, y, f"Median: {df_scored['Overall Index'].median():.2f}")
-        y -= 0.9 * cm
-
-    cat_cols = [cc for cc in CATEGORIES.keys() if cc in df_scored.columns]
-    if cat_cols:
-        c.setFont(font_bold, 12)
-        c.drawString(2 * cm, y, "Category averages (1–10)")
-        y -= 0.6 * cm
-        c.setFont(font_regular, 10)
-
-        for cc in cat_cols:
-            avg = df_scored[cc].mean()
-            if pd.notna(avg):
-                c.drawString(2 * cm, y, f"- {cc}: {avg:.2f}")
-                y -= 0.45 * cm
-                if y < 2.5 * cm:
-                    c.showPage()
-                    y = h - 2.5 * cm
-                    c.setFont(font_regular, 10)
-
-        y -= 0.4 * cm
-
-    if has_department and "Overall Index" in df_scored.columns:
-        dept_avg = df_scored.groupby("department", as_index=False)["Overall Index"].mean().dropna()
-        dept_avg = dept_avg.sort_values("Overall Index", ascending=False)
-
-        if not dept_avg.empty:
-            if y < 6 * cm:
-                c.showPage()
-                y = h - 2.5 * cm
-
-            c.setFont(font_bold, 12)
-            c.drawString(2 * cm, y, "Department averages (Overall Index)")
-            y -= 0.7 * cm
-            c.setFont(font_regular, 10)
-
-            for _, row in dept_avg.iterrows():
-                c.drawString(2 * cm, y, f"- {row['department']}: {row['Overall Index']:.2f}")
-                y -= 0.45 * cm
-                if y < 2.5 * cm:
-                    c.showPage()
-                    y = h - 2.5 * cm
-                    c.setFont(font_regular, 10)
-
-    c.showPage()
-    c.save()
-    return buf.getvalue()
-
-with tab_export:
+# Exports are only built when asked for, and the bytes are cached per data
+# version and filter selection so repeated downloads and reruns reuse them.
+export_key = agg_key + (selected_q,)
+
+@st.cache_data(max_entries=EXPORT_CACHE_ENTRIES, show_spinner="Preparing Excel export...")
+def get_excel_export(key: tuple, _agg: Cube) -> bytes:
+    perf.cache_miss("excel_export")
+    # The filtered rows are a shared, read-only view from the filter index;
+    # scores were already computed by the loader as rows arrived.
+    df_filtered = filter_index.view(selected_dept if has_department else FilterIndex.ALL, start=start_d, end=end_d)
+    return build_excel_bytes(df_filtered, _agg, question_cols, selected_q, has_department)
+
+@st.cache_data(max_entries=EXPORT_CACHE_ENTRIES, show_spinner="Preparing PDF export...")
+def get_pdf_export(key: tuple, _agg: Cube) -> bytes:
+    perf.cache_miss("pdf_export")
+    overall_median = _agg.median(OVERALL_INDEX)
+    return build_pdf_bytes(_agg, overall_median, has_department)
+
+def _prepare_export(key: tuple) -> None:
+    st.session_state["export_key"] = key
+
+with tab_export, perf.stage("tab.export"):
     st.subheader("Export")
 
-    if adf.empty:
+    if n_rows == 0:
         st.info("No data available for the applied filters.")
     else:
-        excel_bytes = build_excel_bytes(fdf, adf)
-        st.download_button(
-            label="Download Excel (filtered + summaries)",
-            data=excel_bytes,
-            file_name="msc_wellbeing_dashboard_export.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            type="primary",
-        )
+        if st.session_state.get("export_key") != export_key:
+            st.button("Prepare export", type="primary", on_click=_prepare_export, args=(export_key,))
+        else:
+            with perf.stage("excel_export", cache="excel_export"):
+                excel_bytes = get_excel_export(export_key, ccube)
+            st.download_button(
+                label="Download Excel (filtered + summaries)",
+                data=excel_bytes,
+                file_name="msc_wellbeing_dashboard_export.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                type="primary",
+            )
 
-        pdf_bytes = build_pdf_bytes(adf)
-        st.download_button(
-            label="Download PDF (summary)",
-            data=pdf_bytes,
-            file_name="msc_wellbeing_summary.pdf",
-            mime="application/pdf",
-            type="primary",
-        )
+            with perf.stage("pdf_export", cache="pdf_export"):
+                pdf_bytes = get_pdf_export(export_key, ccube)
+            st.download_button(
+                label="Download PDF (summary)",
+                data=pdf_bytes,
+                file_name="msc_wellbeing_summary.pdf",
+                mime="application/pdf",
+                type="primary",
+            )
+
+perf_record = profile.finish()
+if show_perf:
+    with perf_panel:
+        st.caption(f"Rerun {perf_record['total_ms']:.0f} ms · RSS {perf_record['rss_kb'] / 1024:.0f} MB")
+        st.dataframe(pd.DataFrame(perf_record["stages"]), hide_index=True, use_container_width=True)
+        st.caption(" · ".join(f"{name}: {state}" for name, state in perf_record["cache"].items()))
+        # Only report Sheets traffic if this process has talked to Sheets.
+        sheets = sys.modules.get("sheets")
+        sheets_metrics = sheets.metrics() if sheets else None
+        if sheets_metrics:
+            st.dataframe(pd.DataFrame.from_dict(sheets_metrics, orient="index"), use_container_width=True)
@@ -0,0 +1,144 @@
+import io
+import tempfile
+from datetime import date
+
+import pandas as pd
+
+from survey_data import CATEGORIES, OVERALL_INDEX, SCORE_COLS, Cube
+
+EXCEL_CHUNK_ROWS = 10_000
+EXCEL_SPOOL_BYTES = 8 * 1024 * 1024
+
+# openpyxl and reportlab are imported inside the builders: together they add
+# noticeably to startup and most dashboard sessions never export.
+
+
+def _write_sheet(wb, title: str, df: pd.DataFrame, columns: list | None = None, chunk_rows: int = EXCEL_CHUNK_ROWS) -> None:
+    # Write-only sheets stream rows to the file instead of building a cell
+    # model, and rows are converted one chunk at a time, so memory stays flat
+    # however many responses are exported.
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    columns = list(df.columns) if columns is None else columns
+    ws = wb.create_sheet(title)
+    header = []
+    for name in columns:
+        cell = WriteOnlyCell(ws, value="Department" if name == "department" else str(name))
+        cell.font = Font(bold=True)
+        header.append(cell)
+    ws.append(header)
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows][columns].astype(object)
+        chunk = chunk.where(chunk.notna(), None)
+        for row in chunk.itertuples(index=False, name=None):
+            ws.append(row)
+
+
+def build_excel_bytes(df_filtered: pd.DataFrame, agg: Cube, question_cols: list[str], selected_q: str, has_department: bool = True) -> bytes:
+    from openpyxl import Workbook
+
+    raw_cols = [c for c in df_filtered.columns if c not in SCORE_COLS]
+    means = agg.mean()
+
+    wb = Workbook(write_only=True)
+    _write_sheet(wb, "Filtered Raw", df_filtered, columns=raw_cols)
+
+    # Summary sheets come straight from the cube.
+    q_avg = means[question_cols].to_frame("Average").reset_index().rename(columns={"index": "Question"})
+    _write_sheet(wb, "Question Avg", q_avg)
+
+    if has_department:
+        cols = [selected_q] + [OVERALL_INDEX]
+        cols = [c for c in cols if c in agg.measures]
+        if cols:
+            dept_avg = agg.mean(by="department")[cols].reset_index()
+            _write_sheet(wb, "Dept Avg", dept_avg)
+
+    cat_cols = [c for c in CATEGORIES.keys() if c in agg.measures]
+    if cat_cols:
+        cat_avg = means[cat_cols].to_frame("Average").reset_index().rename(columns={"index": "Category"})
+        _write_sheet(wb, "Category Avg", cat_avg)
+
+    with tempfile.SpooledTemporaryFile(max_size=EXCEL_SPOOL_BYTES) as output:
+        wb.save(output)
+        output.seek(0)
+        return output.read()
+
+
+def build_pdf_bytes(agg: Cube, overall_median: float, has_department: bool = True) -> bytes:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import cm
+    from reportlab.pdfgen import canvas
+
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
+    w, h = A4
+
+    font_bold = "Helvetica-Bold"
+    font_regular = "Helvetica"
+
+    c.setFont(font_bold, 16)
+    c.drawString(2 * cm, h - 2.2 * cm, "MSC Latvia – Wellbeing Survey (Summary)")
+
+    c.setFont(font_regular, 10)
+    c.drawString(2 * cm, h - 2.9 * cm, f"Generated: {date.today().isoformat()}")
+    c.drawString(2 * cm, h - 3.5 * cm, f"Rows (after filters): {agg.responses()}")
+
+    y = h - 5.2 * cm
+    stats = agg.stats()
+
+    if OVERALL_INDEX in agg.measures and stats["count"][OVERALL_INDEX] > 0:
+        c.setFont(font_bold, 12)
+        c.drawString(2 * cm, y, "Overall Index")
+        y -= 0.6 * cm
+        c.setFont(font_regular, 10)
+        c.drawString(2 * cm, y, f"Average: {stats['mean'][OVERALL_INDEX]:.2f}")
+        y -= 0.5 * cm
+        c.drawString(2 * cm, y, f"Median: {overall_median:.2f}")
+        y -= 0.9 * cm
+
+    cat_cols = [cc for cc in CATEGORIES.keys() if cc in agg.measures]
+    if cat_cols:
+        c.setFont(font_bold, 12)
+        c.drawString(2 * cm, y, "Category averages (1–10)")
+        y -= 0.6 * cm
+        c.setFont(font_regular, 10)
+
+        for cc in cat_cols:
+            avg = stats["mean"][cc]
+            if pd.notna(avg):
+                c.drawString(2 * cm, y, f"- {cc}: {avg:.2f}")
+                y -= 0.45 * cm
+                if y < 2.5 * cm:
+                    c.showPage()
+                    y = h - 2.5 * cm
+                    c.setFont(font_regular, 10)
+
+        y -= 0.4 * cm
+
+    if has_department and OVERALL_INDEX in agg.measures:
+        dept_avg = agg.mean(by="department")[[OVERALL_INDEX]].dropna().reset_index()
+        dept_avg = dept_avg.sort_values("Overall Index", ascending=False)
+
+        if not dept_avg.empty:
+            if y < 6 * cm:
+                c.showPage()
+                y = h - 2.5 * cm
+
+            c.setFont(font_bold, 12)
+            c.drawString(2 * cm, y, "Department averages (Overall Index)")
+            y -= 0.7 * cm
+            c.setFont(font_regular, 10)
+
+            for _, row in dept_avg.iterrows():
+                c.drawString(2 * cm, y, f"- {row['department']}: {row['Overall Index']:.2f}")
+                y -= 0.45 * cm
+                if y < 2.5 * cm:
+                    c.showPage()
+                    y = h - 2.5 * cm
+                    c.setFont(font_regular, 10)
+
+    c.showPage()
+    c.save()
+    return buf.getvalue()
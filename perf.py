@@ -0,0 +1,94 @@
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger("perf")
+# Nothing configures the perf logger, so its INFO records go nowhere by
+# default. PERF_LOG=1 sends one rerun_profile JSON line per script run to
+# stderr.
+if os.environ.get("PERF_LOG", "") not in ("", "0"):
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(levelname)s %(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+_local = threading.local()
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _rss_bytes() -> int | None:
+    # /proc is a single small read on Linux; elsewhere memory deltas are
+    # simply not reported rather than paying for tracemalloc.
+    try:
+        with open("/proc/self/statm", "rb") as fh:
+            return int(fh.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class RerunProfile:
+    # Wall time and resident-memory change of each named stage of one script
+    # run, plus whether each cached function it called was a hit or a miss.
+    def __init__(self, script: str):
+        self.script = script
+        self.stages: list[dict] = []
+        self.cache: dict[str, str] = {}
+        self._t0 = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str, cache: str | None = None):
+        if cache:
+            # A miss runs the cached body, which flips this via cache_miss().
+            self.cache[cache] = "hit"
+        rss0 = _rss_bytes()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            rss1 = _rss_bytes()
+            self.stages.append({
+                "stage": name,
+                "ms": round((time.perf_counter() - t0) * 1000, 2),
+                "rss_delta_kb": (rss1 - rss0) // 1024 if rss0 is not None and rss1 is not None else None,
+            })
+
+    def finish(self) -> dict:
+        record = {
+            "script": self.script,
+            "total_ms": round((time.perf_counter() - self._t0) * 1000, 2),
+            "rss_kb": (_rss_bytes() or 0) // 1024,
+            "stages": self.stages,
+            "cache": self.cache,
+        }
+        logger.info("rerun_profile %s", json.dumps(record, separators=(",", ":")))
+        return record
+
+
+def start(script: str) -> RerunProfile:
+    profile = RerunProfile(script)
+    _local.profile = profile
+    return profile
+
+
+def current() -> RerunProfile | None:
+    return getattr(_local, "profile", None)
+
+
+@contextmanager
+def stage(name: str, cache: str | None = None):
+    profile = current()
+    if profile is None:
+        yield
+        return
+    with profile.stage(name, cache):
+        yield
+
+
+def cache_miss(name: str) -> None:
+    profile = current()
+    if profile is not None:
+        profile.cache[name] = "miss"
@@ -0,0 +1,165 @@
+import time
+import logging
+import threading
+from http import HTTPStatus
+from collections.abc import Mapping
+
+import gspread
+import requests
+from gspread.exceptions import APIError
+from gspread.http_client import HTTPClient
+from google.oauth2.service_account import Credentials
+from tenacity import Retrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+READ_SCOPES = ["https://www.googleapis.com/auth/spreadsheets.readonly"]
+WRITE_SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
+
+# Sheets allows 60 read and 60 write requests per minute for each user (here,
+# the service account) of a project.
+READ_REQUESTS_PER_MINUTE = 60
+WRITE_REQUESTS_PER_MINUTE = 60
+BURST_REQUESTS = 10
+TIMEOUT_SECONDS = 30.0
+MAX_ATTEMPTS = 6
+MAX_BACKOFF_SECONDS = 32.0
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    # Refills at (per_minute - burst) / 60 tokens a second, so even a full
+    # burst followed by steady use never exceeds per_minute in any minute.
+    def __init__(self, per_minute: int, burst: int = BURST_REQUESTS):
+        self._capacity = float(burst)
+        self._rate = (per_minute - burst) / 60.0
+        self._tokens = self._capacity
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self._capacity, self._tokens + (now - self._stamp) * self._rate)
+                self._stamp = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self._rate
+            time.sleep(delay)
+            waited += delay
+
+
+class SheetsMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: dict[str, dict[str, float]] = {}
+
+    def _entry(self, kind: str) -> dict[str, float]:
+        return self._stats.setdefault(kind, {"calls": 0, "errors": 0, "retries": 0, "throttled_s": 0.0, "latency_s": 0.0, "max_latency_s": 0.0})
+
+    def record(self, kind: str, latency: float, throttled: float, ok: bool) -> None:
+        with self._lock:
+            entry = self._entry(kind)
+            entry["calls"] += 1
+            entry["errors"] += not ok
+            entry["throttled_s"] += throttled
+            entry["latency_s"] += latency
+            entry["max_latency_s"] = max(entry["max_latency_s"], latency)
+
+    def retry(self, kind: str) -> None:
+        with self._lock:
+            self._entry(kind)["retries"] += 1
+
+    def snapshot(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            out = {}
+            for kind, entry in self._stats.items():
+                calls = entry["calls"]
+                out[kind] = {
+                    "calls": calls,
+                    "errors": entry["errors"],
+                    "retries": entry["retries"],
+                    "throttled_s": round(entry["throttled_s"], 3),
+                    "avg_ms": round(entry["latency_s"] / calls * 1000, 1) if calls else None,
+                    "max_ms": round(entry["max_latency_s"] * 1000, 1),
+                }
+            return out
+
+
+_buckets = {"read": TokenBucket(READ_REQUESTS_PER_MINUTE), "write": TokenBucket(WRITE_REQUESTS_PER_MINUTE)}
+_metrics = SheetsMetrics()
+_clients: dict[tuple, gspread.Client] = {}
+_clients_lock = threading.Lock()
+
+
+def _status(exc: BaseException) -> int | None:
+    return exc.code if isinstance(exc, APIError) else None
+
+
+def _retry_read(exc: BaseException) -> bool:
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+        return True
+    code = _status(exc)
+    return code is not None and (code == HTTPStatus.TOO_MANY_REQUESTS or code >= HTTPStatus.INTERNAL_SERVER_ERROR)
+
+
+def _retry_write(exc: BaseException) -> bool:
+    # A 429 is rejected before anything is applied. A 5xx or dropped
+    # connection may already have appended the rows, so those go back to the
+    # caller, which decides whether replaying is safe.
+    return _status(exc) == HTTPStatus.TOO_MANY_REQUESTS
+
+
+class QuotaHTTPClient(HTTPClient):
+    # Every request, from every client in the process, draws from the shared
+    # per-minute bucket for its kind and is retried with jittered backoff.
+    def request(self, method: str, endpoint: str, *args, **kwargs) -> requests.Response:
+        kind = "read" if method.upper() == "GET" else "write"
+        retrying = Retrying(
+            retry=retry_if_exception(_retry_read if kind == "read" else _retry_write),
+            wait=wait_random_exponential(multiplier=1, max=MAX_BACKOFF_SECONDS),
+            stop=stop_after_attempt(MAX_ATTEMPTS),
+            before_sleep=lambda state: self._before_retry(kind, method, endpoint, state),
+            reraise=True,
+        )
+        return retrying(self._send, kind, method, endpoint, *args, **kwargs)
+
+    def _send(self, kind: str, method: str, endpoint: str, *args, **kwargs) -> requests.Response:
+        throttled = _buckets[kind].acquire()
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            response = super().request(method, endpoint, *args, **kwargs)
+            ok = True
+            return response
+        finally:
+            _metrics.record(kind, time.perf_counter() - t0, throttled, ok)
+
+    @staticmethod
+    def _before_retry(kind: str, method: str, endpoint: str, state) -> None:
+        _metrics.retry(kind)
+        logger.warning(
+            "Sheets %s %s failed (%s), retry %d in %.1fs",
+            method.upper(), endpoint, state.outcome.exception(), state.attempt_number, state.next_action.sleep,
+        )
+
+
+def get_client(service_account_info: Mapping, scopes: list[str] = READ_SCOPES, timeout: float = TIMEOUT_SECONDS) -> gspread.Client:
+    # One authorized client per (service account, scopes) for the whole
+    # process; its session keeps connections to the API open between calls
+    # and refreshes the access token when it expires.
+    key = (service_account_info.get("client_email"), tuple(scopes))
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            creds = Credentials.from_service_account_info(service_account_info, scopes=scopes)
+            client = gspread.authorize(creds, http_client=QuotaHTTPClient)
+            client.set_timeout(timeout)
+            _clients[key] = client
+        return client
+
+
+def metrics() -> dict[str, dict[str, float]]:
+    return _metrics.snapshot()
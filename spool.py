@@ -0,0 +1,181 @@
+import os
+import re
+import json
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # No flock on Windows: every Spool uses the first journal and nothing
+    # stops a second writer there.
+    fcntl = None
+
+SPOOL_FILE = "responses.spool"
+COMPACT_BYTES = 1 << 20
+
+
+class Spool:
+    # Append-only journal of survey rows. Each line is "<seq>\t<json row>\n" and is
+    # fsync'd before append() returns; the highest delivered seq lives in a
+    # separate checkpoint file so unacknowledged rows can be replayed on restart.
+    #
+    # Two writers on one journal would hand out the same seqs and checkpoint
+    # each other's rows, so each Spool owns a journal of its own, flock'd while
+    # it is open: path itself, or path.1, path.2, ... when another process (or
+    # a writer not yet shut down) holds the first. A journal nobody holds
+    # belongs to a writer that is gone; adopt_orphans() moves its undelivered
+    # rows into this one.
+    def __init__(self, path: str = SPOOL_FILE):
+        self._base = path
+        self._lock = threading.Lock()
+        self._fh, self._path = _claim(path)
+        self._ack_path = self._path + ".ack"
+        self._acked = _read_ack(self._ack_path)
+        entries, end = _read_journal(self._path)
+        self._pending = [e for e in entries if e[0] > self._acked]
+        self._seq = max([self._acked] + [seq for seq, _ in entries])
+        if self._fh.tell() != end:
+            self._fh.truncate(end)
+        self.adopt_orphans()
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def acked(self) -> int:
+        return self._acked
+
+    def append(self, values: list) -> int:
+        with self._lock:
+            seq = self._seq + 1
+            line = f"{seq}\t{json.dumps(values, separators=(',', ':'))}\n"
+            self._fh.write(line.encode("utf-8"))
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+            self._seq = seq
+            self._pending.append((seq, values))
+            return seq
+
+    def pending(self, limit: int | None = None) -> list[tuple[int, list]]:
+        with self._lock:
+            return list(self._pending[:limit])
+
+    def ack(self, seq: int) -> None:
+        with self._lock:
+            if seq <= self._acked:
+                return
+            _write_ack(self._ack_path, seq)
+            self._acked = seq
+            self._pending = [e for e in self._pending if e[0] > seq]
+            # Once everything is delivered the journal carries no information
+            # beyond the checkpoint, so it can be truncated to keep replay cheap.
+            if not self._pending and self._fh.tell() >= COMPACT_BYTES:
+                self._fh.truncate(0)
+                self._fh.seek(0)
+                os.fsync(self._fh.fileno())
+
+    def adopt_orphans(self) -> int:
+        # Copies the undelivered rows of every journal no live writer holds
+        # into this one, then checkpoints and empties the orphan. A crash in
+        # between can only deliver those rows twice, never lose them.
+        if fcntl is None:
+            return 0
+        adopted = 0
+        for path in _journals(self._base):
+            if path == self._path:
+                continue
+            fh = _lock(path)
+            if fh is None:
+                continue
+            try:
+                acked = _read_ack(path + ".ack")
+                entries, _ = _read_journal(path)
+                rows = [(seq, values) for seq, values in entries if seq > acked]
+                for _, values in rows:
+                    self.append(values)
+                if rows:
+                    _write_ack(path + ".ack", rows[-1][0])
+                fh.truncate(0)
+                os.fsync(fh.fileno())
+                adopted += len(rows)
+            finally:
+                fh.close()
+        return adopted
+
+    def close(self) -> None:
+        with self._lock:
+            self._fh.close()
+
+
+def _parse(line: bytes) -> tuple[int, list] | None:
+    # A crash mid-write can leave a torn final line; it was never
+    # acknowledged to the user, so it is cut off rather than replayed.
+    if not line.endswith(b"\n"):
+        return None
+    try:
+        seq, payload = line.rstrip(b"\n").split(b"\t", 1)
+        return int(seq), json.loads(payload)
+    except ValueError:
+        return None
+
+
+def _read_journal(path: str) -> tuple[list[tuple[int, list]], int]:
+    # The journal's entries up to the first torn or unreadable line, and the
+    # byte offset where that line starts.
+    entries, end = [], 0
+    with open(path, "rb") as fh:
+        for line in fh:
+            entry = _parse(line)
+            if entry is None:
+                break
+            end += len(line)
+            entries.append(entry)
+    return entries, end
+
+
+def _read_ack(path: str) -> int:
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            return int(fh.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def _write_ack(path: str, seq: int) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        fh.write(str(seq))
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
+
+def _lock(path: str):
+    # path opened for appending and flock'd, or None if someone holds it.
+    fh = open(path, "ab")
+    if fcntl is None:
+        return fh
+    try:
+        fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        fh.close()
+        return None
+    return fh
+
+
+def _claim(base: str):
+    # The first of base, base.1, base.2, ... that nobody holds.
+    n = 0
+    while True:
+        path = base if n == 0 else f"{base}.{n}"
+        fh = _lock(path)
+        if fh is not None:
+            return fh, path
+        n += 1
+
+
+def _journals(base: str) -> list[str]:
+    folder = os.path.dirname(base) or "."
+    name = re.compile(re.escape(os.path.basename(base)) + r"(\.\d+)?")
+    return sorted(os.path.join(os.path.dirname(base), f) for f in os.listdir(folder) if name.fullmatch(f))
@@ -0,0 +1,33 @@
+import os
+import re
+from functools import cache
+
+import streamlit as st
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STYLES_DIR = os.path.join(ROOT, "styles")
+
+# Files in static/ are served by Streamlit itself (server.enableStaticServing in
+# .streamlit/config.toml) and cached by the browser, so the logo and the
+# bundled font are fetched once instead of travelling with every rerun.
+LOGO_URL = "app/static/msc_logo.png"
+
+
+@cache
+def stylesheet(name: str) -> str:
+    # Read and minified once per process. Streamlit serves static .css files
+    # as text/plain, which browsers refuse to apply, so styles are still
+    # inlined, just without comments and indentation.
+    with open(os.path.join(STYLES_DIR, name), encoding="utf-8") as fh:
+        css = fh.read()
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    return re.sub(r"\s*([{};,>])\s*", r"\1", css).strip()
+
+
+def inject_css(name: str) -> None:
+    st.markdown(f"<style>{stylesheet(name)}</style>", unsafe_allow_html=True)
+
+
+def logo(width: str = "100%") -> None:
+    st.markdown(f'<img src="{LOGO_URL}" alt="MSC" style="width: {width}; display: block; margin: 0 auto;">', unsafe_allow_html=True)
@@ -0,0 +1,245 @@
+import os
+import csv
+import sqlite3
+import threading
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+from survey_data import QUESTION_COLS, Cube, parse_rows
+
+HEADER = ["timestamp", "department"] + QUESTION_COLS
+CSV_FILE = "responses.csv"
+SQLITE_FILE = "responses.db"
+BACKENDS = ("sheets", "csv", "sqlite")
+
+
+class ResponseStore:
+    # Append-only table of survey responses, one list of cells per row in
+    # header order. A row's seq is its 1-based position, so "everything after
+    # seq" is well defined for every backend.
+    def append(self, rows: list[list]) -> None:
+        raise NotImplementedError
+
+    def read_all(self) -> tuple[list[str], list[list]]:
+        raise NotImplementedError
+
+    def read_since(self, seq: int, width: int) -> tuple[list[str], list[list]]:
+        # Header plus the rows after seq, each at most width cells wide.
+        header, rows = self.read_all()
+        return header, [r[:width] for r in rows[seq:]]
+
+    def aggregate(self, department: str | None = None, start=None, end=None) -> Cube:
+        # Per (department, day) question aggregates over the matching rows.
+        # Backends without a query engine parse everything and filter in memory.
+        header, rows = self.read_all()
+        if not rows:
+            return Cube.empty()
+        return Cube.from_frame(parse_rows(header, rows)).select(department, start, end)
+
+    def close(self) -> None:
+        pass
+
+
+class SheetsStore(ResponseStore):
+    # The worksheet is opened on first use, so gspread and google-auth are only
+    # imported once something is actually read or written.
+    def __init__(self, open_ws):
+        self._open_ws = open_ws
+        self._ws = None
+
+    def _call(self, fn):
+        if self._ws is None:
+            self._ws = self._open_ws()
+        try:
+            return fn(self._ws)
+        except Exception:
+            # The worksheet handle may be stale (renamed, recreated); reopen it
+            # on the next call.
+            self._ws = None
+            raise
+
+    def append(self, rows: list[list]) -> None:
+        self._call(lambda ws: ws.append_rows(rows, value_input_option="USER_ENTERED"))
+
+    def read_all(self) -> tuple[list[str], list[list]]:
+        values = self._call(lambda ws: ws.get_all_values())
+        return (values[0], values[1:]) if values else ([], [])
+
+    def read_since(self, seq: int, width: int) -> tuple[list[str], list[list]]:
+        # One batch_get for the header and the tail; data row seq + 1 sits on
+        # sheet row seq + 2, below the header.
+        from gspread.utils import rowcol_to_a1
+
+        last_col = rowcol_to_a1(1, width).rstrip("0123456789")
+        header, tail = self._call(lambda ws: ws.batch_get([f"A1:{last_col}1", f"A{seq + 2}:{last_col}"]))
+        return (header[0] if header else []), [list(r) for r in tail]
+
+
+class CsvStore(ResponseStore):
+    # A plain CSV file, for running both apps offline. Every read scans the
+    # whole file, so it suits development and small surveys.
+    def __init__(self, path: str = CSV_FILE):
+        self._path = path
+        self._lock = threading.Lock()
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, "w", newline="", encoding="utf-8") as fh:
+                csv.writer(fh).writerow(HEADER)
+
+    def append(self, rows: list[list]) -> None:
+        with self._lock, open(self._path, "a", newline="", encoding="utf-8") as fh:
+            csv.writer(fh).writerows(rows)
+            fh.flush()
+            os.fsync(fh.fileno())
+
+    def read_all(self) -> tuple[list[str], list[list]]:
+        with open(self._path, "r", newline="", encoding="utf-8") as fh:
+            text = fh.read()
+        # A batch still being written by the form app is left for next time.
+        if text and not text.endswith("\n"):
+            text = text[:text.rfind("\n") + 1]
+        values = list(csv.reader(text.splitlines()))
+        return (values[0], values[1:]) if values else ([], [])
+
+
+class SqliteStore(ResponseStore):
+    # Responses in a SQLite table keyed by an integer id that doubles as the
+    # seq, since rows are only ever appended. WAL mode lets the dashboard read
+    # while the form app writes, and the department and timestamp indexes let
+    # aggregate() filter and group inside SQLite.
+    def __init__(self, path: str = SQLITE_FILE):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        answers = ", ".join(f"{q} INTEGER" for q in QUESTION_COLS)
+        with self._conn:
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS responses (id INTEGER PRIMARY KEY, timestamp TEXT, department TEXT, {answers})")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_department ON responses (department)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_timestamp ON responses (timestamp)")
+        self._columns = ", ".join(HEADER)
+
+    def append(self, rows: list[list]) -> None:
+        placeholders = ", ".join("?" * len(HEADER))
+        # Blank cells are stored as NULL, like an empty cell in the sheet.
+        values = [[None if v == "" else v for v in (list(r) + [""] * len(HEADER))[:len(HEADER)]] for r in rows]
+        with self._lock, self._conn:
+            self._conn.executemany(f"INSERT INTO responses ({self._columns}) VALUES ({placeholders})", values)
+
+    def _select(self, where: str = "", params: tuple = ()) -> list[list]:
+        with self._lock:
+            cur = self._conn.execute(f"SELECT {self._columns} FROM responses {where} ORDER BY id", params)
+            return [["" if v is None else v for v in r] for r in cur]
+
+    def read_all(self) -> tuple[list[str], list[list]]:
+        return list(HEADER), self._select()
+
+    def read_since(self, seq: int, width: int) -> tuple[list[str], list[list]]:
+        return list(HEADER), [r[:width] for r in self._select("WHERE id > ?", (seq,))]
+
+    def aggregate(self, department: str | None = None, start=None, end=None) -> Cube:
+        where, params = [], []
+        if department is not None:
+            where.append("department = ?")
+            params.append(department)
+        if start is not None or end is not None:
+            # Text that is not a date sorts after every ISO timestamp, so it is
+            # excluded explicitly, as Cube.select drops undated rows.
+            where.append("date(timestamp) IS NOT NULL")
+        if start is not None:
+            where.append("timestamp >= ?")
+            params.append(pd.Timestamp(start).isoformat())
+        if end is not None:
+            where.append("timestamp < ?")
+            params.append((pd.Timestamp(end).normalize() + pd.Timedelta(days=1)).isoformat())
+        # Same validity rule as parse_rows: only whole answers 1-10 count.
+        valid = ", ".join(f"CASE WHEN {q} BETWEEN 1 AND 10 AND {q} = CAST({q} AS INTEGER) THEN {q} END AS {q}" for q in QUESTION_COLS)
+        measures = ", ".join(f"COUNT({q}), TOTAL({q}), TOTAL({q} * {q}), MIN({q}), MAX({q})" for q in QUESTION_COLS)
+        # Answer histograms in the same scan, ten bins per question.
+        bins = ", ".join(f"TOTAL({q} = {v})" for q in QUESTION_COLS for v in range(1, 11))
+        sql = (
+            f"SELECT department, day, COUNT(*), {measures}, {bins} FROM ("
+            f"SELECT NULLIF(department, '') AS department, date(timestamp) AS day, {valid} FROM responses"
+            f"{' WHERE ' + ' AND '.join(where) if where else ''}"
+            f") GROUP BY department, day"
+        )
+        with self._lock:
+            result = self._conn.execute(sql, params).fetchall()
+
+        index = pd.MultiIndex.from_arrays(
+            [pd.Index([r[0] for r in result], dtype=object), pd.to_datetime(pd.Series([r[1] for r in result], dtype=object), errors="coerce")],
+            names=Cube.KEYS,
+        )
+        width = len(QUESTION_COLS) * 5
+        values = np.array([r[3:3 + width] for r in result], dtype=float).reshape(len(result), len(QUESTION_COLS), 5)
+        part = lambda i: pd.DataFrame(values[:, :, i], index=index, columns=QUESTION_COLS)
+        return Cube(
+            n=pd.Series([r[2] for r in result], index=index, dtype="int64"),
+            count=part(0).astype("int64"),
+            total=part(1),
+            sumsq=part(2),
+            lo=part(3),
+            hi=part(4),
+            # Questions only: the Overall Index depends on weights that live
+            # in the dashboard, not in the database.
+            hist=pd.DataFrame(
+                np.array([r[3 + width:] for r in result], dtype=np.int64).reshape(len(result), len(QUESTION_COLS) * 10),
+                index=index,
+                columns=pd.MultiIndex.from_tuples([(q, float(v)) for q in QUESTION_COLS for v in range(1, 11)], names=["measure", "value"]),
+            ),
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def waves(secrets: Mapping) -> list[str | None]:
+    # Survey waves in the order they ran, from the [waves] table in
+    # secrets.toml: names = ["2025-Q1", "2025-Q2", ...]. Without one, all
+    # responses live in a single partition, named None.
+    return list(secrets.get("waves", {}).get("names", [])) or [None]
+
+
+def current_wave(secrets: Mapping) -> str | None:
+    # The wave still collecting responses: [waves] current, or the last one
+    # listed. Every other wave is closed and never changes again.
+    return secrets.get("waves", {}).get("current", waves(secrets)[-1])
+
+
+def wave_path(path: str, wave: str | None) -> str:
+    # responses.csv holds the single partition; wave 2025-Q1 goes to
+    # responses-2025-Q1.csv.
+    if wave is None:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}-{wave}{ext}"
+
+
+def open_store(secrets: Mapping, write: bool = False, timeout: float | None = None, wave: str | None = None) -> ResponseStore:
+    # Chosen by the [storage] table in secrets.toml: backend = "sheets"
+    # (default), "csv" or "sqlite", plus an optional path for the file
+    # backends. Sheets uses the [sheets] and [gcp_service_account] tables.
+    # Each wave is its own partition: a worksheet named after the wave, or a
+    # file next to path (see wave_path).
+    config = secrets.get("storage", {})
+    backend = config.get("backend", "sheets")
+    if backend == "csv":
+        return CsvStore(wave_path(config.get("path", CSV_FILE), wave))
+    if backend == "sqlite":
+        return SqliteStore(wave_path(config.get("path", SQLITE_FILE), wave))
+    if backend == "sheets":
+        creds_info = secrets["gcp_service_account"]
+        sheet_id = secrets["sheets"]["spreadsheet_id"]
+        ws_name = wave if wave is not None else secrets["sheets"]["worksheet_name"]
+
+        def open_ws():
+            import sheets
+
+            scopes = sheets.WRITE_SCOPES if write else sheets.READ_SCOPES
+            client = sheets.get_client(creds_info, scopes, timeout=timeout or sheets.TIMEOUT_SECONDS)
+            return client.open_by_key(sheet_id).worksheet(ws_name)
+
+        return SheetsStore(open_ws)
+    raise ValueError(f"Unknown storage backend {backend!r}, expected one of {', '.join(BACKENDS)}")
@@ -0,0 +1,845 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+try:
+    import fcntl
+except ImportError:
+    # No flock on Windows: processes sharing a snapshot each refresh on their
+    # own, as if they did not share it.
+    fcntl = None
+
+QUESTION_COLS = [f"q{i}" for i in range(1, 16)]
+
+COMPANY_DEPARTMENTS = [
+    "Administration",
+    "Customer Invoicing",
+    "Finance & Accounting",
+    "Commercial Reporting & BI",
+    "Information Technology",
+    "OVA",
+    "Documentation, Pricing & Legal",
+]
+
+CATEGORIES = {
+    "Workload & Recovery": ["q1", "q2", "q3"],
+    "Team & Leadership": ["q4", "q5", "q6"],
+    "Motivation & Wellbeing": ["q7", "q8", "q9"],
+    "Work-Life Balance": ["q10", "q11", "q12"],
+    "Growth & Recognition": ["q13", "q14", "q15"],
+}
+
+OVERALL_INDEX = "Overall Index"
+SCORE_COLS = list(CATEGORIES) + [OVERALL_INDEX]
+SNAPSHOT_FILE = "responses.arrow"
+SNAPSHOT_META_KEY = b"survey_loader"
+SNAPSHOT_MAX_BATCHES = 512
+WAVE_LOAD_WORKERS = 4
+
+logger = logging.getLogger(__name__)
+
+
+ANSWER_DTYPE = "UInt8"
+SCORE_DTYPE = "float32"
+
+
+def department_dtype(extra=()) -> pd.CategoricalDtype:
+    # Known departments keep their form order; anything else seen in the sheet
+    # is appended so it still shows up rather than being dropped.
+    return pd.CategoricalDtype(COMPANY_DEPARTMENTS + sorted(set(extra) - set(COMPANY_DEPARTMENTS)))
+
+
+def parse_rows(header: list[str], rows: list[list[str]]) -> pd.DataFrame:
+    # The Sheets API trims trailing empty cells, so short rows are padded out to
+    # the header width before building the frame.
+    width = len(header)
+    rows = [(r + [""] * (width - len(r)))[:width] for r in rows]
+    df = pd.DataFrame(rows, columns=header)
+
+    # Answers are whole numbers 1-10 and departments come from a short fixed
+    # list, so the store uses nullable uint8 and categorical codes instead of
+    # Python strings and float64.
+    if "timestamp" in df.columns:
+        df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
+        df.insert(df.columns.get_loc("timestamp") + 1, "survey_date", df["timestamp"].dt.normalize())
+
+    if "department" in df.columns:
+        dept = df["department"].mask(df["department"] == "")
+        df["department"] = dept.astype(department_dtype(dept.dropna().unique()))
+
+    for col in QUESTION_COLS:
+        if col in df.columns:
+            num = pd.to_numeric(df[col], errors="coerce")
+            num = num.where((num >= 1) & (num <= 10) & (num % 1 == 0))
+            df[col] = num.astype(ANSWER_DTYPE)
+
+    return df
+
+
+def concat_rows(*frames: pd.DataFrame) -> pd.DataFrame:
+    # pd.concat falls back to object dtype when categoricals disagree, so every
+    # frame is widened to the union of departments first.
+    if all("department" in f.columns for f in frames):
+        dtype = department_dtype([c for f in frames for c in f["department"].cat.categories])
+        frames = [f if f["department"].dtype == dtype else f.assign(department=f["department"].astype(dtype)) for f in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+def _dated_rows(df: pd.DataFrame) -> int:
+    # In a frame sorted by sort_by_time, the dated rows come first.
+    return int(df["timestamp"].notna().sum())
+
+
+def is_time_sorted(df: pd.DataFrame) -> bool:
+    if "timestamp" not in df.columns:
+        return True
+    ts = df["timestamp"]
+    n = _dated_rows(df)
+    return bool(ts.iloc[n:].isna().all()) and ts.iloc[:n].is_monotonic_increasing
+
+
+def sort_by_time(df: pd.DataFrame) -> pd.DataFrame:
+    # Oldest first, undated rows last. The sort is stable, so rows with equal
+    # timestamps keep the order they were submitted in.
+    if is_time_sorted(df):
+        return df
+    return df.sort_values("timestamp", kind="stable", na_position="last", ignore_index=True)
+
+
+def append_in_time_order(a: pd.DataFrame, b: pd.DataFrame) -> pd.DataFrame:
+    # a and b each sorted by sort_by_time; the result is what sort_by_time
+    # would make of them concatenated. Normally b's dated rows come after a's,
+    # so they only have to go in ahead of a's undated rows. Late rows (a
+    # retried submission, say) mean sorting everything again.
+    if "timestamp" not in a.columns or "timestamp" not in b.columns:
+        return concat_rows(a, b)
+    na, nb = _dated_rows(a), _dated_rows(b)
+    if na and nb and a["timestamp"].iloc[na - 1] > b["timestamp"].iloc[0]:
+        return sort_by_time(concat_rows(a, b))
+    if na == len(a) or nb == 0:
+        return concat_rows(a, b)
+    return concat_rows(a.iloc[:na], b.iloc[:nb], a.iloc[na:], b.iloc[nb:])
+
+
+def weight_matrix(question_weights: dict[str, float] | None = None) -> pd.DataFrame:
+    # Questions x categories. With no weights each category is the plain mean of
+    # its answered questions, matching the original row-wise mean.
+    question_weights = question_weights or {}
+    w = pd.DataFrame(0.0, index=QUESTION_COLS, columns=list(CATEGORIES))
+    for cat, qs in CATEGORIES.items():
+        for q in qs:
+            w.loc[q, cat] = question_weights.get(q, 1.0)
+    return w
+
+
+def _weighted_nanmean(values: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    # Missing answers drop out of both the numerator and the denominator, so a
+    # respondent is scored on the questions they answered; rows with nothing
+    # answered in a category stay NaN.
+    present = ~np.isnan(values)
+    num = np.where(present, values, 0.0) @ weights
+    den = present.astype(float) @ weights
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(den > 0, num / den, np.nan)
+
+
+def category_scores(df_in: pd.DataFrame, weights: pd.DataFrame | None = None, category_weights: dict[str, float] | None = None) -> pd.DataFrame:
+    weights = weight_matrix() if weights is None else weights
+    qs = [q for q in weights.index if q in df_in.columns]
+    w = weights.loc[qs]
+    w = w.loc[:, (w != 0).any()]
+    if w.empty:
+        return pd.DataFrame(index=df_in.index)
+
+    answers = df_in[qs].to_numpy(dtype=float, na_value=np.nan)
+    cats = _weighted_nanmean(answers, w.to_numpy())
+    cw = np.array([(category_weights or {}).get(c, 1.0) for c in w.columns])[:, None]
+    overall = _weighted_nanmean(cats, cw)
+
+    out = pd.DataFrame(cats.astype(SCORE_DTYPE), index=df_in.index, columns=w.columns)
+    out[OVERALL_INDEX] = overall[:, 0].astype(SCORE_DTYPE)
+    return out
+
+
+def compute_category_scores(df_in: pd.DataFrame, weights: pd.DataFrame | None = None, category_weights: dict[str, float] | None = None) -> pd.DataFrame:
+    scores = category_scores(df_in, weights, category_weights)
+    return pd.concat([df_in.drop(columns=[c for c in scores.columns if c in df_in.columns]), scores], axis=1)
+
+
+def _histogram(group: np.ndarray, index: pd.MultiIndex, values: pd.DataFrame) -> pd.DataFrame:
+    # Responses per row of index (group gives each response's row) for every
+    # value of every question and of the Overall Index, one column per
+    # (measure, value). Answers take ten values; the Overall Index takes as
+    # many as the weights allow, a few hundred at most.
+    n_groups = len(index)
+    blocks, columns = [np.zeros((n_groups, 0), dtype=np.int64)], []
+
+    qs = [c for c in values.columns if c in QUESTION_COLS]
+    if qs:
+        # parse_rows has already blanked anything but whole answers 1-10.
+        a = values[qs].to_numpy(dtype=float)
+        ok = ~np.isnan(a)
+        bins = (group[:, None] * len(qs) + np.arange(len(qs))) * 10 + np.where(ok, a, 1).astype(np.int64) - 1
+        blocks.append(np.bincount(bins[ok], minlength=n_groups * len(qs) * 10).reshape(n_groups, len(qs) * 10))
+        columns += [(q, float(v)) for q in qs for v in range(1, 11)]
+
+    if OVERALL_INDEX in values.columns:
+        a = values[OVERALL_INDEX].to_numpy(dtype=float)
+        ok = ~np.isnan(a)
+        uniq, codes = np.unique(a[ok], return_inverse=True)
+        blocks.append(np.bincount(group[ok] * len(uniq) + codes, minlength=n_groups * len(uniq)).reshape(n_groups, len(uniq)))
+        columns += [(OVERALL_INDEX, float(v)) for v in uniq]
+
+    return pd.DataFrame(
+        np.hstack(blocks),
+        index=index,
+        columns=pd.MultiIndex.from_tuples(columns, names=["measure", "value"]),
+    )
+
+
+def period_start(days: pd.DatetimeIndex, freq: str) -> pd.DatetimeIndex:
+    # First day of the period each day falls in, for the trend frequencies:
+    # "D", "W-MON" (weeks starting Monday), "MS" (months) and "QS" (quarters).
+    if freq == "D":
+        return days
+    if freq == "W-MON":
+        return days - pd.to_timedelta(days.dayofweek, unit="D")
+    return days.to_period({"MS": "M", "QS": "Q"}[freq]).to_timestamp()
+
+
+def _period_of(day, freq: str) -> pd.Timestamp:
+    day = pd.Timestamp(day).normalize()
+    if freq == "D":
+        return day
+    return {"W-MON": pd.offsets.Week(weekday=0), "MS": pd.offsets.MonthBegin(), "QS": pd.offsets.QuarterBegin(startingMonth=1)}[freq].rollback(day)
+
+
+def _counts_quantile(counts: pd.Series, q: float) -> float:
+    # counts is indexed by sorted value. Interpolates linearly between the two
+    # nearest ranks, exactly as Series.quantile and Series.median do on the
+    # underlying rows. Values with no responses are skipped.
+    n = int(counts.sum())
+    if n == 0:
+        return float("nan")
+    cum = counts.to_numpy().cumsum()
+    values = counts.index.to_numpy(dtype=float)
+    h = (n - 1) * q
+    lo, hi = int(np.floor(h)), int(np.ceil(h))
+    v_lo = values[np.searchsorted(cum, lo, side="right")]
+    v_hi = values[np.searchsorted(cum, hi, side="right")]
+    return float(v_lo + (h - lo) * (v_hi - v_lo))
+
+
+class Cube:
+    # Count, sum, sum of squares, min and max of every question, category and
+    # Overall Index per (department, day). Cubes over disjoint rows merge by
+    # adding counts and sums, so the loader can extend one as rows arrive, and
+    # every average, spread or range the dashboard shows can be read back in
+    # time proportional to departments x measures instead of responses.
+    #
+    # hist holds a histogram of every question and of the Overall Index per
+    # (department, day). It merges by adding bins, and medians, quantiles and
+    # distributions are read from it exactly, without touching responses.
+    #
+    # rollup(freq) is the same cube per (department, week, month or quarter),
+    # built on first use and then carried through merge(), so trends over long
+    # histories read a few hundred periods instead of every day.
+    KEYS = ["department", "day"]
+
+    def __init__(self, n: pd.Series, count: pd.DataFrame, total: pd.DataFrame, sumsq: pd.DataFrame, lo: pd.DataFrame, hi: pd.DataFrame, hist: pd.DataFrame | None = None):
+        self.n = n
+        self.count = count
+        self.total = total
+        self.sumsq = sumsq
+        self.lo = lo
+        self.hi = hi
+        self.hist = pd.DataFrame(index=n.index, columns=pd.MultiIndex.from_tuples([], names=["measure", "value"]), dtype="int64") if hist is None else hist
+        self._rollups: dict[str, Cube] = {}
+        self._keys: tuple[np.ndarray, np.ndarray] | None = None
+
+    @classmethod
+    def from_frame(cls, df_scored: pd.DataFrame) -> "Cube":
+        measures = [c for c in QUESTION_COLS + list(CATEGORIES) + [OVERALL_INDEX] if c in df_scored.columns]
+        keys = pd.DataFrame({
+            "department": df_scored["department"] if "department" in df_scored.columns else pd.Series(pd.NA, index=df_scored.index, dtype=object),
+            "day": df_scored["timestamp"].dt.normalize() if "timestamp" in df_scored.columns else pd.Series(pd.NaT, index=df_scored.index),
+        })
+        values = df_scored[measures].astype(float)
+        by = [keys["department"], keys["day"]]
+        grouped = values.groupby(by, dropna=False, observed=True)
+        parts = dict(
+            n=grouped.size(),
+            count=grouped.count(),
+            total=grouped.sum(),
+            sumsq=(values ** 2).groupby(by, dropna=False, observed=True).sum(),
+            lo=grouped.min(),
+            hi=grouped.max(),
+            hist=_histogram(grouped.ngroup().to_numpy(), grouped.size().index, values),
+        )
+        # The cube is tiny, so its department level is kept as plain labels;
+        # that keeps merges independent of each frame's categorical dtype.
+        for part in parts.values():
+            part.index = part.index.set_levels(part.index.levels[0].astype(object), level=0)
+        return cls(**parts)
+
+    @classmethod
+    def empty(cls) -> "Cube":
+        return cls.from_frame(pd.DataFrame({"department": pd.Series(dtype=object), "timestamp": pd.Series(dtype="datetime64[ns]")}))
+
+    @property
+    def measures(self) -> list[str]:
+        return self.count.columns.tolist()
+
+    def merge(self, other: "Cube") -> "Cube":
+        # Existing cells are copied as they are and only the (department, day)
+        # keys in other are combined, so merging a batch of new rows costs the
+        # batch, not another pass over every cell of the history. Keys seen for
+        # the first time go at the end; nothing relies on the index order.
+        at = self.n.index.get_indexer(other.n.index)
+        new = at < 0
+        at[new] = len(self.n) + np.arange(int(new.sum()))
+        index = self.n.index.append(other.n.index[new]) if new.any() else self.n.index
+
+        def combine(a, b, ufunc, fill):
+            if isinstance(a, pd.DataFrame) and not a.columns.equals(b.columns):
+                # A batch usually has fewer histogram bins than the history.
+                if not b.columns.isin(a.columns).all():
+                    a = a.reindex(columns=a.columns.union(b.columns), fill_value=fill)
+                b = b.reindex(columns=a.columns, fill_value=fill)
+            values = a.to_numpy()
+            values = np.concatenate([values, np.full((int(new.sum()),) + values.shape[1:], fill, dtype=values.dtype)])
+            values[at] = ufunc(values[at], b.to_numpy())
+            if isinstance(a, pd.Series):
+                return pd.Series(values, index=index, name=a.name, copy=False)
+            return pd.DataFrame(values, index=index, columns=a.columns, copy=False)
+
+        merged = Cube(
+            n=combine(self.n, other.n, np.add, 0),
+            count=combine(self.count, other.count, np.add, 0),
+            total=combine(self.total, other.total, np.add, 0.0),
+            sumsq=combine(self.sumsq, other.sumsq, np.add, 0.0),
+            lo=combine(self.lo, other.lo, np.fmin, np.nan),
+            hi=combine(self.hi, other.hi, np.fmax, np.nan),
+            hist=combine(self.hist, other.hist, np.add, 0),
+        )
+        # Rollups already built are extended with the other side's, which for
+        # a batch of new rows covers only a few periods.
+        for freq, rollup in list(self._rollups.items()):
+            merged._rollups[freq] = rollup.merge(other.rollup(freq))
+        return merged
+
+    def rollup(self, freq: str) -> "Cube":
+        # This cube with days replaced by the first day of their period (see
+        # period_start). Built once per cube and frequency.
+        if freq == "D":
+            return self
+        rollup = self._rollups.get(freq)
+        if rollup is None:
+            index = pd.MultiIndex.from_arrays(
+                [self.n.index.get_level_values("department"), period_start(self.n.index.get_level_values("day"), freq)],
+                names=self.KEYS,
+            )
+            regroup = lambda part: part.set_axis(index).groupby(level=self.KEYS, dropna=False)
+            rollup = self._rollups[freq] = Cube(
+                n=regroup(self.n).sum(),
+                count=regroup(self.count).sum(),
+                total=regroup(self.total).sum(),
+                sumsq=regroup(self.sumsq).sum(),
+                lo=regroup(self.lo).min(),
+                hi=regroup(self.hi).max(),
+                hist=regroup(self.hist).sum(),
+            )
+        return rollup
+
+    def _mask(self, department: str | None = None, start=None, end=None) -> np.ndarray:
+        if self._keys is None:
+            self._keys = (self.n.index.get_level_values("department").to_numpy(), self.n.index.get_level_values("day").to_numpy())
+        departments, days = self._keys
+        # NaT compares false both ways, so a date bound also drops undated rows.
+        mask = np.ones(len(days), dtype=bool)
+        if department is not None:
+            mask &= departments == department
+        if start is not None:
+            mask &= days >= np.datetime64(pd.Timestamp(start))
+        if end is not None:
+            mask &= days <= np.datetime64(pd.Timestamp(end))
+        return mask
+
+    def select(self, department: str | None = None, start=None, end=None) -> "Cube":
+        m = self._mask(department, start, end)
+        return Cube(self.n[m], self.count[m], self.total[m], self.sumsq[m], self.lo[m], self.hi[m], self.hist[m])
+
+    def responses(self) -> int:
+        return int(self.n.sum())
+
+    def _rollup(self, by: str | None):
+        if by is None:
+            return self.count.sum(), self.total.sum(), self.sumsq.sum(), self.lo.min(), self.hi.max()
+        g = lambda f: f.groupby(level=by)
+        return g(self.count).sum(), g(self.total).sum(), g(self.sumsq).sum(), g(self.lo).min(), g(self.hi).max()
+
+    def stats(self, by: str | None = None) -> dict:
+        # by=None collapses everything; by="department" or by="day" keeps that
+        # level. Returns count/mean/std/min/max, each a Series over measures or
+        # a frame indexed by the kept level.
+        count, total, sumsq, lo, hi = self._rollup(by)
+        n = count.where(count > 0)
+        mean = total / n
+        var = (sumsq - n * mean ** 2) / (n - 1)
+        return {"count": count, "mean": mean, "std": var.clip(lower=0) ** 0.5, "min": lo, "max": hi}
+
+    def mean(self, by: str | None = None):
+        return self.stats(by)["mean"]
+
+    def _bins(self, measure: str) -> pd.DataFrame:
+        h = self.hist.loc[:, self.hist.columns.get_level_values("measure") == measure]
+        return h.droplevel("measure", axis=1).sort_index(axis=1)
+
+    def distribution(self, measure: str) -> pd.Series:
+        # Responses per value of a question or the Overall Index, in value
+        # order, leaving out values nobody gave.
+        counts = self._bins(measure).sum()
+        return counts[counts > 0]
+
+    def quantile(self, measure: str, q: float = 0.5, by: str | None = None):
+        bins = self._bins(measure)
+        if by is None:
+            return _counts_quantile(bins.sum(), q)
+        return bins.groupby(level=by, observed=True).sum().apply(lambda row: _counts_quantile(row, q), axis=1)
+
+    def median(self, measure: str, by: str | None = None):
+        return self.quantile(measure, 0.5, by)
+
+    def trend(self, measure: str, freq: str = "D", department: str | None = None, start=None, end=None) -> pd.DataFrame:
+        # Per-period average of one measure over the rows select() would keep,
+        # weighted by response counts, with empty periods dropped. Periods are
+        # labelled by their first day (see period_start). Whole periods inside
+        # the range come from the rollup; only the partial periods at either
+        # end are summed from days.
+        rollup = self.rollup(freq)
+        pieces = [(rollup, start, end)]
+        if rollup is not self and (start is not None or end is not None):
+            day = pd.Timedelta(days=1)
+            first = _period_of(start, freq) if start is not None else None
+            full_from = first if start is None or first == pd.Timestamp(start) else first + pd.tseries.frequencies.to_offset(freq)
+            # The period holding the day after end starts the partial tail.
+            tail = _period_of(pd.Timestamp(end) + day, freq) if end is not None else None
+            pieces = [(rollup, full_from, None if tail is None else tail - day)]
+            if full_from != first:
+                pieces.append((self, start, full_from - day if end is None else min(full_from - day, pd.Timestamp(end))))
+            if tail is not None and tail <= pd.Timestamp(end) and (full_from is None or tail >= full_from):
+                pieces.append((self, tail, end))
+        count, total = [], []
+        for cube, lo, hi in pieces:
+            m = cube._mask(department, lo, hi)
+            period = cube._keys[1][m]
+            if cube is not rollup:
+                period = period_start(pd.DatetimeIndex(period), freq)
+            count.append(pd.Series(cube.count[measure].to_numpy()[m], index=period))
+            total.append(pd.Series(cube.total[measure].to_numpy()[m], index=period))
+        count = pd.concat(count).groupby(level=0).sum()
+        total = pd.concat(total).groupby(level=0).sum()
+        out = pd.DataFrame({"avg": total / count, "n": count})[count > 0]
+        return out.rename_axis("survey_date").reset_index()
+
+
+def heatmap_cells(dept_means: pd.DataFrame, question_cols: list[str]) -> pd.DataFrame:
+    # The department x question pivot of cube averages is at most 7 x 15, so
+    # the long frame for Altair is built straight from it: row-major order is
+    # already department order then question order.
+    pivot = dept_means.reindex(index=[d for d in COMPANY_DEPARTMENTS if d in dept_means.index], columns=question_cols)
+    scores = pivot.to_numpy(dtype=float)
+    r, c = np.nonzero(~np.isnan(scores))
+    return pd.DataFrame({
+        "Department": pivot.index.to_numpy()[r],
+        "Question": pivot.columns.to_numpy()[c],
+        "Score": scores[r, c],
+    })
+
+
+class FilterIndex:
+    # Row positions of every department, computed once per data load. The frame
+    # for a department is cut out the first time it is asked for and then
+    # shared by every rerun and session until the next load, so switching the
+    # department filter is a dict lookup. Views are read-only.
+    #
+    # The loader keeps rows sorted by time (sort_by_time), and so is every
+    # department's frame, so a date range is two binary searches and a slice.
+    ALL = "All"
+    DATE_COL = "survey_date"
+
+    def __init__(self, df: pd.DataFrame):
+        if not is_time_sorted(df):
+            raise ValueError("FilterIndex needs a frame sorted by sort_by_time")
+        self._df = df
+        self._positions: dict[str, np.ndarray] = {}
+        if "department" in df.columns:
+            self._positions = {k: v for k, v in df.groupby("department", sort=False, observed=True).indices.items()}
+        self._views: dict[str, pd.DataFrame] = {self.ALL: df}
+        self._dates: dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def _frame(self, department: str) -> pd.DataFrame:
+        frame = self._views.get(department)
+        if frame is None:
+            with self._lock:
+                frame = self._views.get(department)
+                if frame is None:
+                    pos = self._positions.get(department, np.empty(0, dtype=np.intp))
+                    frame = self._views[department] = self._df.iloc[pos]
+        return frame
+
+    def dates(self, department: str = ALL) -> np.ndarray:
+        # The department's dated rows' dates, ascending; undated rows sort last
+        # and are left out.
+        dates = self._dates.get(department)
+        if dates is None:
+            frame = self._frame(department)
+            if self.DATE_COL not in frame.columns:
+                dates = np.empty(0, dtype="datetime64[ns]")
+            else:
+                col = frame[self.DATE_COL]
+                dates = col.to_numpy()[:int(col.notna().sum())]
+            self._dates[department] = dates
+        return dates
+
+    def view(self, department: str = ALL, start=None, end=None) -> pd.DataFrame:
+        frame = self._frame(department)
+        if (start is None and end is None) or self.DATE_COL not in frame.columns:
+            return frame
+        dates = self.dates(department)
+        lo = 0 if start is None else int(np.searchsorted(dates, np.datetime64(pd.Timestamp(start)), side="left"))
+        hi = len(dates) if end is None else int(np.searchsorted(dates, np.datetime64(pd.Timestamp(end)), side="right"))
+        return frame.iloc[lo:max(lo, hi)]
+
+
+class ResponseLoader:
+    # Keeps the parsed responses from one store (see storage.py) and, on
+    # refresh, fetches only the rows appended since the last call. Responses
+    # are append-only; if the header changes or the last ingested row no longer
+    # matches, the store was edited and the loader falls back to a full reload.
+    #
+    # Category and Overall Index scores are computed once per ingested row and
+    # kept with the data, so filtering never has to rescore.
+    #
+    # With a snapshot_path the parsed rows are also kept in an Arrow IPC stream,
+    # in the order they were read, one record batch per refresh that found new
+    # rows, so a fresh process starts from the snapshot and only reconciles the
+    # rows added since it was written. Only a full reload rewrites the file,
+    # and so does every SNAPSHOT_MAX_BATCHES batches to keep reads cheap. The
+    # high-water mark lives in <snapshot>.stamp together with the file's
+    # generation and length; bytes past that length were never stamped and
+    # are ignored.
+    #
+    # With shared_max_age as well, the snapshot is a cache shared by every
+    # process using the same path (dashboard replicas on one host). A process
+    # adopts the rows another one appended as soon as the stamp shows them,
+    # reading only the batches after its own, and only the one holding the
+    # lock file goes to the store, and only once the last check is older than
+    # shared_max_age seconds, so store traffic does not grow with the number
+    # of processes.
+    #
+    # A closed loader holds a survey wave that no longer takes responses. Once
+    # it has data, from the store or a snapshot, refresh never reads again.
+    def __init__(self, store, snapshot_path: str | None = None, weights: pd.DataFrame | None = None, category_weights: dict[str, float] | None = None, closed: bool = False, shared_max_age: float | None = None):
+        self._store = store
+        self._snapshot_path = snapshot_path
+        self._closed = closed
+        self._shared_max_age = shared_max_age if snapshot_path else None
+        self._weights = weights
+        self._category_weights = category_weights
+        self._lock = threading.Lock()
+        self._header: list[str] | None = None
+        self._last_row: list[str] | None = None
+        self._n_rows = 0
+        self._df = pd.DataFrame()
+        self.cube = Cube.empty()
+        self._version = 0
+        # Where this loader's rows end in the snapshot file.
+        self._snapshot_gen: str | None = None
+        self._snapshot_size = 0
+        self._snapshot_batches = 0
+        self._snapshot_schema: pa.Schema | None = None
+        if snapshot_path:
+            stamp = self._read_stamp()
+            if stamp is not None:
+                self._read_snapshot(stamp)
+
+    def refresh(self) -> tuple[pd.DataFrame, Cube, int]:
+        # The version is bumped whenever the data changes, so callers can key
+        # derived results (exports, rendered tables) on it.
+        with self._lock:
+            if self._closed and self._header is not None:
+                return self._df, self.cube, self._version
+            if self._shared_max_age is None:
+                self._refresh_from_store()
+            else:
+                self._refresh_shared()
+            return self._df, self.cube, self._version
+
+    def _refresh_from_store(self) -> None:
+        df = self._df
+        # Without a generation the snapshot no longer matches what is held (a
+        # write failed), so it is rebuilt from a full read.
+        stale = self._snapshot_path and self._snapshot_gen is None
+        if self._header is None or stale or not self._append_new():
+            self._full_reload()
+        if self._df is not df:
+            self._version += 1
+            if self._snapshot_path:
+                self._write_stamp()
+
+    def _refresh_shared(self) -> None:
+        if self._adopt_shared():
+            return
+        # Whoever gets the lock checks the store; everyone else keeps serving
+        # what they have, unless they have nothing yet and wait for it.
+        lock = _lock_file(self._snapshot_path + ".lock", wait=self._header is None)
+        if lock is None:
+            return
+        try:
+            if self._adopt_shared():
+                return
+            self._refresh_from_store()
+            self._write_stamp()
+        finally:
+            lock.close()
+
+    def _adopt_shared(self) -> bool:
+        # Picks up the rows another process added since this one last looked,
+        # and says whether the store was checked recently enough to skip it.
+        stamp = self._read_stamp()
+        if stamp is None:
+            return False
+        if stamp["version"] != self._version:
+            self._read_snapshot(stamp)
+        return self._version == stamp["version"] and self._header is not None and time.time() - stamp["checked_at"] < self._shared_max_age
+
+    def _read_stamp(self) -> dict | None:
+        try:
+            with open(self._snapshot_path + ".stamp", encoding="utf-8") as fh:
+                stamp = json.load(fh)
+            return stamp if {"version", "checked_at", "generation", "size", "header", "last_row", "n_rows"} <= stamp.keys() else None
+        except (OSError, ValueError, AttributeError):
+            return None
+
+    def _write_stamp(self) -> None:
+        # Written after every change, and in shared mode after every check of
+        # the store, changed or not, so the other processes know it is fresh
+        # without touching the snapshot.
+        stamp = {
+            "version": self._version,
+            "checked_at": time.time(),
+            "generation": self._snapshot_gen,
+            "size": self._snapshot_size,
+            "header": self._header,
+            "last_row": self._last_row,
+            "n_rows": self._n_rows,
+        }
+        tmp = self._snapshot_path + ".stamp.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump(stamp, fh)
+            os.replace(tmp, self._snapshot_path + ".stamp")
+        except OSError:
+            logger.warning("Could not write %s.stamp", self._snapshot_path, exc_info=True)
+
+    def _score(self, df: pd.DataFrame) -> pd.DataFrame:
+        return compute_category_scores(df, self._weights, self._category_weights)
+
+    def _reset(self) -> None:
+        self._header = None
+        self._last_row = None
+        self._n_rows = 0
+        self._df = pd.DataFrame()
+        self.cube = Cube.empty()
+
+    def _add_rows(self, parsed: pd.DataFrame) -> None:
+        # Scores rows that follow the ones already held and merges them in, so
+        # the cost is that of the new rows.
+        new_df = sort_by_time(self._score(parsed))
+        self._df = append_in_time_order(self._df, new_df) if not self._df.empty else new_df
+        self.cube = self.cube.merge(Cube.from_frame(new_df))
+
+    def _full_reload(self) -> None:
+        header, rows = self._store.read_all()
+        self._reset()
+        if rows:
+            header = [c.strip() for c in header]
+            self._header = header
+            self._last_row = rows[-1]
+            self._n_rows = len(rows)
+            parsed = parse_rows(header, rows)
+            self._df = sort_by_time(self._score(parsed))
+            self.cube = Cube.from_frame(self._df)
+        if self._snapshot_path:
+            self._write_snapshot(parsed if rows else None, rewrite=True)
+
+    def _append_new(self) -> bool:
+        width = len(self._header)
+        # Re-read the last ingested row along with everything after it, so a
+        # deletion shows up as a mismatch.
+        header, tail = self._store.read_since(self._n_rows - 1, width)
+
+        header = [c.strip() for c in header]
+        header += [""] * (width - len(header))
+        if header != self._header:
+            logger.info("Worksheet header changed, reloading all rows")
+            return False
+
+        pad = lambda r: (list(r) + [""] * (width - len(r)))[:width]
+        if not tail or pad(tail[0]) != pad(self._last_row):
+            logger.info("Worksheet rows were edited or deleted, reloading all rows")
+            return False
+
+        new_rows = [pad(r) for r in tail[1:]]
+        if new_rows:
+            parsed = parse_rows(self._header, new_rows)
+            self._add_rows(parsed)
+            self._last_row = new_rows[-1]
+            self._n_rows += len(new_rows)
+            if self._snapshot_path:
+                self._write_snapshot(parsed)
+        return True
+
+    def _read_snapshot(self, stamp: dict) -> None:
+        # Takes over the state in stamp: only the batches after this loader's
+        # own when the file is the one it already read from, otherwise all of
+        # them.
+        if stamp["header"] is None:
+            # The store was found empty.
+            self._reset()
+            self._snapshot_gen, self._snapshot_size, self._snapshot_batches = None, 0, 0
+            self._version = stamp["version"]
+            return
+        incremental = stamp["generation"] == self._snapshot_gen and self._header is not None
+        start = self._snapshot_size if incremental else 0
+        try:
+            # The file is mapped rather than read, and Arrow IPC needs no
+            # decoding; columns are only copied where pandas needs its own
+            # layout.
+            source = pa.memory_map(self._snapshot_path)
+            schema = pa.ipc.open_stream(source.read_at(stamp["size"], 0)).schema
+            if json.loads(schema.metadata[SNAPSHOT_META_KEY])["generation"] != stamp["generation"]:
+                raise ValueError("snapshot was rewritten after its stamp")
+            if incremental:
+                messages = pa.ipc.MessageReader.open_stream(source.read_at(stamp["size"] - start, start))
+                batches = [pa.ipc.read_record_batch(m, schema) for m in iter(messages.read_next_message, None)]
+            else:
+                batches = pa.ipc.open_stream(source.read_at(stamp["size"], 0)).read_all().to_batches()
+            parsed = _rows_from_snapshot(pa.Table.from_batches(batches, schema))
+        except Exception:
+            # Usually a rewrite landing between reading the stamp and the file;
+            # the next stamp matches. Either way the next read starts over.
+            logger.info("Ignoring unreadable snapshot %s", self._snapshot_path, exc_info=True)
+            self._snapshot_gen = None
+            return
+        if not incremental:
+            self._reset()
+            self._snapshot_batches = 0
+        # Scores are recomputed rather than trusted from the file, so a change of
+        # weights takes effect without invalidating the snapshot.
+        if len(parsed):
+            self._add_rows(parsed)
+        self._header = stamp["header"]
+        self._last_row = stamp["last_row"]
+        self._n_rows = stamp["n_rows"]
+        self._version = stamp["version"]
+        self._snapshot_gen = stamp["generation"]
+        self._snapshot_size = stamp["size"]
+        self._snapshot_batches += len(batches)
+        self._snapshot_schema = schema
+
+    def _write_snapshot(self, parsed: pd.DataFrame | None, rewrite: bool = False) -> None:
+        # Appends the rows just added to the snapshot, or starts a new file
+        # with them (a new generation) after a full reload. The caller stamps
+        # the result.
+        try:
+            if parsed is None:
+                if os.path.exists(self._snapshot_path):
+                    os.remove(self._snapshot_path)
+                self._snapshot_gen, self._snapshot_size, self._snapshot_batches = None, 0, 0
+                return
+            if not rewrite and self._snapshot_gen is not None and self._snapshot_batches < SNAPSHOT_MAX_BATCHES:
+                batch = _snapshot_batch(parsed, self._snapshot_schema)
+                with open(self._snapshot_path, "r+b") as fh:
+                    # Drops whatever a writer that died before stamping left.
+                    fh.truncate(self._snapshot_size)
+                    fh.seek(self._snapshot_size)
+                    fh.write(batch.serialize())
+                    self._snapshot_size = fh.tell()
+                self._snapshot_batches += 1
+                return
+            if rewrite:
+                table = pa.Table.from_batches([_snapshot_batch(parsed)])
+            else:
+                # Compaction: everything stamped so far plus the new rows, as
+                # a single batch.
+                source = pa.memory_map(self._snapshot_path)
+                old = pa.ipc.open_stream(source.read_at(self._snapshot_size, 0)).read_all()
+                table = pa.concat_tables([old, pa.Table.from_batches([_snapshot_batch(parsed, old.schema)])]).combine_chunks()
+            generation = uuid.uuid4().hex
+            schema = table.schema.with_metadata({**(table.schema.metadata or {}), SNAPSHOT_META_KEY: json.dumps({"generation": generation})})
+            tmp = self._snapshot_path + ".tmp"
+            with open(tmp, "wb") as fh:
+                fh.write(schema.serialize())
+                for batch in table.to_batches():
+                    fh.write(batch.serialize())
+                size = fh.tell()
+            os.replace(tmp, self._snapshot_path)
+            self._snapshot_gen, self._snapshot_size, self._snapshot_batches, self._snapshot_schema = generation, size, 1, schema
+        except (OSError, pa.ArrowException):
+            logger.warning("Could not write snapshot %s", self._snapshot_path, exc_info=True)
+            # Start over with a new file next time.
+            self._snapshot_gen = None
+
+
+def _snapshot_batch(parsed: pd.DataFrame, schema: pa.Schema | None = None) -> pa.RecordBatch:
+    # Rows as parse_rows returns them, less what is derived on reading.
+    # Departments are stored as plain strings: serialized batches carry no
+    # dictionaries.
+    frame = parsed.drop(columns="survey_date", errors="ignore")
+    if "department" in frame.columns:
+        frame = frame.assign(department=frame["department"].astype(object))
+    return pa.RecordBatch.from_pandas(frame, schema=schema, preserve_index=False)
+
+
+def _rows_from_snapshot(table: pa.Table) -> pd.DataFrame:
+    # Back to what parse_rows returned for the same rows.
+    df = table.to_pandas(split_blocks=True)
+    if "timestamp" in df.columns:
+        df.insert(df.columns.get_loc("timestamp") + 1, "survey_date", df["timestamp"].dt.normalize())
+    if "department" in df.columns:
+        dept = df["department"].astype(object)
+        df["department"] = dept.astype(department_dtype(dept.dropna().unique()))
+    return df
+
+
+def _lock_file(path: str, wait: bool = True):
+    # An exclusive flock on path, released when the returned file is closed,
+    # or None if wait is false and another process holds it.
+    fh = open(path, "a+")
+    if fcntl is None:
+        return fh
+    try:
+        fcntl.flock(fh, fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        fh.close()
+        return None
+    return fh
+
+
+def refresh_all(loaders: list[ResponseLoader], max_workers: int = WAVE_LOAD_WORKERS) -> list[tuple[pd.DataFrame, Cube, int]]:
+    # Refreshes several loaders at once; each mostly waits on its store.
+    if len(loaders) <= 1:
+        return [loader.refresh() for loader in loaders]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(loaders)), thread_name_prefix="wave-loader") as pool:
+        return list(pool.map(lambda loader: loader.refresh(), loaders))
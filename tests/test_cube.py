@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_frame
+from survey_data import COMPANY_DEPARTMENTS, OVERALL_INDEX, QUESTION_COLS, Cube, _counts_quantile, compute_category_scores
+
+# The cube's answers are checked against pandas on the rows themselves, on
+# synthetic data that includes malformed answers, timestamps and departments.
+
+FREQS = ["D", "W-MON", "MS", "QS"]
+MEASURES = [QUESTION_COLS[0], QUESTION_COLS[-1], OVERALL_INDEX]
+
+
+@pytest.fixture(scope="module")
+def df():
+    return compute_category_scores(generate_frame(4000, seed=7, months=14, malformed=0.01))
+
+
+@pytest.fixture(scope="module")
+def cube(df):
+    return Cube.from_frame(df)
+
+
+def _period(days: pd.Series, freq: str) -> pd.Series:
+    if freq == "D":
+        return days
+    if freq == "W-MON":
+        return days - pd.to_timedelta(days.dt.weekday, unit="D")
+    return days.dt.to_period("M" if freq == "MS" else "Q").dt.start_time
+
+
+def _expected_trend(df: pd.DataFrame, measure: str, freq: str, department, start, end) -> pd.DataFrame:
+    days = df["timestamp"].dt.normalize()
+    keep = pd.Series(True, index=df.index)
+    if department is not None:
+        keep &= df["department"] == department
+    if start is not None:
+        keep &= days >= start
+    if end is not None:
+        keep &= days <= end
+    rows = df.loc[keep & days.notna(), measure].astype(float)
+    grouped = rows.groupby(_period(days[rows.index], freq))
+    out = pd.DataFrame({"avg": grouped.mean(), "n": grouped.count()})
+    return out[out["n"] > 0].rename_axis("survey_date").reset_index()
+
+
+def _filters(seed: int, count: int):
+    # Ranges that start and end on arbitrary days, so most of them cut weeks,
+    # months and quarters in half, plus open ends and empty ranges.
+    rng = np.random.default_rng(seed)
+    first, span = pd.Timestamp("2023-12-20"), 450
+    for _ in range(count):
+        department = rng.choice([None, *COMPANY_DEPARTMENTS[:3]])
+        start = first + pd.Timedelta(days=int(rng.integers(0, span))) if rng.random() < 0.8 else None
+        end = first + pd.Timedelta(days=int(rng.integers(0, span))) if rng.random() < 0.8 else None
+        yield department, start, end
+
+
+@pytest.mark.parametrize("freq", FREQS)
+def test_trend_matches_rows(df, cube, freq):
+    for i, (department, start, end) in enumerate(_filters(seed=FREQS.index(freq), count=60)):
+        measure = MEASURES[i % len(MEASURES)]
+        got = cube.trend(measure, freq, department, start, end)
+        expected = _expected_trend(df, measure, freq, department, start, end)
+        assert got["survey_date"].tolist() == expected["survey_date"].tolist(), (department, start, end)
+        np.testing.assert_array_equal(got["n"].to_numpy(), expected["n"].to_numpy())
+        np.testing.assert_allclose(got["avg"].to_numpy(dtype=float), expected["avg"].to_numpy(), rtol=1e-6)
+
+
+def test_trend_after_merge_matches_fresh_cube(df, cube):
+    # Rollups built before a merge are extended rather than rebuilt.
+    merged = Cube.from_frame(df.iloc[:2500])
+    for freq in FREQS:
+        merged.rollup(freq)
+    merged = merged.merge(Cube.from_frame(df.iloc[2500:]))
+    for freq in FREQS:
+        for department, start, end in _filters(seed=10 + FREQS.index(freq), count=10):
+            pd.testing.assert_frame_equal(merged.trend(OVERALL_INDEX, freq, department, start, end), cube.trend(OVERALL_INDEX, freq, department, start, end), check_dtype=False)
+
+
+@pytest.mark.parametrize("measure", MEASURES)
+def test_quantiles_match_rows(df, cube, measure):
+    values = df[measure].astype(float)
+    for q in [0.0, 0.1, 0.25, 0.5, 0.75, 0.9, 1.0]:
+        assert cube.quantile(measure, q) == pytest.approx(values.quantile(q), rel=1e-6)
+    expected = values.groupby(df["department"], observed=True).median()
+    got = cube.median(measure, by="department")
+    for department, median in expected.items():
+        assert got[department] == pytest.approx(median, rel=1e-6)
+
+
+def test_distribution_matches_rows(df, cube):
+    measure = QUESTION_COLS[3]
+    expected = df[measure].value_counts().sort_index()
+    got = cube.distribution(measure)
+    got = got[got > 0]
+    assert got.index.astype(float).tolist() == expected.index.astype(float).tolist()
+    assert got.tolist() == expected.tolist()
+
+
+def test_counts_quantile_edges():
+    counts = pd.Series([0, 3, 0, 1], index=[1.0, 2.0, 3.0, 4.0])
+    rows = pd.Series([2.0, 2.0, 2.0, 4.0])
+    for q in np.linspace(0, 1, 21):
+        assert _counts_quantile(counts, q) == pytest.approx(rows.quantile(q))
+    assert np.isnan(_counts_quantile(pd.Series([0, 0], index=[1.0, 2.0]), 0.5))
+    assert _counts_quantile(pd.Series([5], index=[7.0]), 0.5) == 7.0
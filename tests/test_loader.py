@@ -0,0 +1,256 @@
+import csv
+import json
+
+import numpy as np
+import pytest
+
+import survey_data
+from benchmarks.synthetic import generate_rows
+from storage import CsvStore
+from survey_data import ResponseLoader, is_time_sorted
+
+# Loaders against a CSV store in a temporary directory, checked against a
+# loader that reads the whole store from scratch.
+
+
+class CountingStore(CsvStore):
+    # Counts full reads and delta reads apart.
+    def __init__(self, path):
+        super().__init__(path)
+        self.reads = 0
+        self.deltas = 0
+
+    def read_all(self):
+        self.reads += 1
+        return super().read_all()
+
+    def read_since(self, seq, width):
+        self.deltas += 1
+        header, rows = super().read_all()
+        return header, [r[:width] for r in rows[seq:]]
+
+
+@pytest.fixture
+def rows():
+    return [r for chunk in generate_rows(600, seed=3, months=3) for r in chunk]
+
+
+@pytest.fixture
+def store(tmp_path, rows):
+    store = CountingStore(str(tmp_path / "responses.csv"))
+    store.append(rows[:400])
+    return store
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    return str(tmp_path / "responses.arrow")
+
+
+def assert_matches_store(loader, store):
+    df, cube, _ = loader.refresh()
+    ref_df, ref_cube, _ = ResponseLoader(CsvStore(store._path)).refresh()
+    assert df.reset_index(drop=True).equals(ref_df.reset_index(drop=True))
+    assert cube.responses() == ref_cube.responses()
+    stats, ref_stats = cube.stats(), ref_cube.stats()
+    for key in ref_stats:
+        assert np.allclose(np.asarray(stats[key], float), np.asarray(ref_stats[key], float), equal_nan=True)
+
+
+def expire(snapshot):
+    # Makes the next refresh of a shared loader go to the store.
+    with open(snapshot + ".stamp", encoding="utf-8") as fh:
+        stamp = json.load(fh)
+    stamp["checked_at"] = 0
+    with open(snapshot + ".stamp", "w", encoding="utf-8") as fh:
+        json.dump(stamp, fh)
+
+
+def rewrite(store, edit):
+    # Rewrites the CSV file behind the store: edit maps its rows, header
+    # first, to the new ones.
+    with open(store._path, newline="", encoding="utf-8") as fh:
+        values = list(csv.reader(fh))
+    with open(store._path, "w", newline="", encoding="utf-8") as fh:
+        csv.writer(fh).writerows(edit(values))
+
+
+def test_new_rows_are_appended(store, rows):
+    loader = ResponseLoader(store)
+    _, _, version = loader.refresh()
+    store.append(rows[400:450])
+    df, _, new_version = loader.refresh()
+    assert (store.reads, store.deltas) == (1, 1)
+    assert new_version == version + 1
+    assert len(df) == 450
+    assert_matches_store(loader, store)
+
+    # Nothing new: the same frame and version.
+    same_df, _, same_version = loader.refresh()
+    assert same_df is df and same_version == new_version
+    assert store.reads == 1
+
+
+def test_header_change_reloads_everything(store, rows):
+    loader = ResponseLoader(store)
+    loader.refresh()
+    rewrite(store, lambda values: [values[0] + ["comment"]] + [r + [""] for r in values[1:]])
+    store.append([r + ["late"] for r in rows[400:410]])
+    df, _, _ = loader.refresh()
+    assert store.reads == 2
+    assert "comment" in df.columns
+    assert_matches_store(loader, store)
+
+
+@pytest.mark.parametrize("edit", [
+    lambda values: values[:-1] + [values[-1][:2] + ["1"] * 15],
+    lambda values: values[:-1],
+], ids=["edited", "deleted"])
+def test_changed_last_row_reloads_everything(store, rows, edit):
+    loader = ResponseLoader(store)
+    loader.refresh()
+    rewrite(store, edit)
+    store.append(rows[400:410])
+    loader.refresh()
+    assert store.reads == 2
+    assert_matches_store(loader, store)
+
+
+def test_restart_resumes_from_the_snapshot(store, snapshot, rows):
+    ResponseLoader(store, snapshot_path=snapshot).refresh()
+    store.append(rows[400:450])
+
+    restarted_store = CountingStore(store._path)
+    restarted = ResponseLoader(restarted_store, snapshot_path=snapshot)
+    assert len(restarted._df) == 400
+    df, _, _ = restarted.refresh()
+    assert (restarted_store.reads, restarted_store.deltas) == (0, 1)
+    assert len(df) == 450
+    assert_matches_store(restarted, store)
+
+
+def test_replica_reads_only_the_rows_appended(store, snapshot, rows):
+    leader = ResponseLoader(store, snapshot_path=snapshot, shared_max_age=60)
+    leader.refresh()
+    replica_store = CountingStore(store._path)
+    replica = ResponseLoader(replica_store, snapshot_path=snapshot, shared_max_age=60)
+    assert replica.refresh()[2] == leader.refresh()[2]
+
+    for start in (400, 450, 500):
+        store.append(rows[start:start + 50])
+        expire(snapshot)
+        leader.refresh()
+        before = replica._snapshot_size
+        replica.refresh()
+        assert replica._snapshot_size > before
+        assert_matches_store(replica, store)
+
+    assert store.reads == 1
+    assert replica_store.reads == 0
+    assert replica._snapshot_gen == leader._snapshot_gen
+    assert replica._snapshot_batches == 4
+
+
+@pytest.mark.skipif(survey_data.fcntl is None, reason="needs flock")
+def test_only_the_lock_holder_reads_the_store(store, snapshot, rows):
+    leader = ResponseLoader(store, snapshot_path=snapshot, shared_max_age=60)
+    leader.refresh()
+    replica_store = CountingStore(store._path)
+    replica = ResponseLoader(replica_store, snapshot_path=snapshot, shared_max_age=60)
+    store.append(rows[400:450])
+    expire(snapshot)
+
+    # Another process is checking the store: keep serving what is held.
+    lock = survey_data._lock_file(snapshot + ".lock")
+    try:
+        df, _, _ = replica.refresh()
+    finally:
+        lock.close()
+    assert len(df) == 400
+    assert replica_store.deltas == 0
+
+    df, _, _ = replica.refresh()
+    assert len(df) == 450
+    assert (replica_store.reads, replica_store.deltas) == (0, 1)
+    # The leader picks up the replica's check instead of repeating it.
+    leader.refresh()
+    assert (store.reads, store.deltas) == (1, 0)
+    assert_matches_store(leader, store)
+
+
+def test_replica_rereads_a_rewritten_snapshot(store, snapshot, rows):
+    leader = ResponseLoader(store, snapshot_path=snapshot, shared_max_age=60)
+    replica = ResponseLoader(CountingStore(store._path), snapshot_path=snapshot, shared_max_age=60)
+    leader.refresh()
+    replica.refresh()
+    generation = replica._snapshot_gen
+
+    # Rewriting the last row forces the leader into a full reload.
+    with open(store._path, "r+", encoding="utf-8") as fh:
+        text = fh.read().rstrip("\n")
+        fh.seek(0)
+        fh.truncate()
+        fh.write(text[:text.rfind("\n") + 1])
+    store.append(rows[500:510])
+    expire(snapshot)
+    leader.refresh()
+
+    replica.refresh()
+    assert replica._snapshot_gen != generation
+    assert replica._snapshot_batches == 1
+    assert_matches_store(replica, store)
+
+
+def test_unstamped_bytes_are_ignored(store, snapshot, rows):
+    loader = ResponseLoader(store, snapshot_path=snapshot)
+    loader.refresh()
+    # A writer that died between appending a batch and stamping it.
+    with open(snapshot, "ab") as fh:
+        fh.write(b"\xff" * 100)
+
+    assert_matches_store(ResponseLoader(CountingStore(store._path), snapshot_path=snapshot), store)
+    store.append(rows[400:420])
+    loader.refresh()
+    restarted = ResponseLoader(CountingStore(store._path), snapshot_path=snapshot)
+    assert restarted._snapshot_batches == 2
+    assert_matches_store(restarted, store)
+
+
+def test_snapshot_is_compacted(store, snapshot, rows, monkeypatch):
+    monkeypatch.setattr(survey_data, "SNAPSHOT_MAX_BATCHES", 3)
+    loader = ResponseLoader(store, snapshot_path=snapshot)
+    loader.refresh()
+    generation = loader._snapshot_gen
+    for start in range(400, 600, 40):
+        store.append(rows[start:start + 40])
+        loader.refresh()
+    assert loader._snapshot_gen != generation
+    assert loader._snapshot_batches <= 3
+    assert store.reads == 1
+
+    restarted = ResponseLoader(CountingStore(store._path), snapshot_path=snapshot)
+    assert restarted._snapshot_batches == loader._snapshot_batches
+    assert_matches_store(restarted, store)
+
+
+def test_late_and_undated_rows_keep_time_order(store, snapshot, rows):
+    loader = ResponseLoader(store, snapshot_path=snapshot)
+    loader.refresh()
+    answers = ["5"] * 15
+    store.append([["not a date", "HR"] + answers, ["", "HR"] + answers])
+    loader.refresh()
+
+    store.append([
+        # Submitted after newer rows: a retried submission.
+        [rows[10][0], "IT"] + answers,
+        # Ties an existing row; goes after it.
+        [rows[399][0], "Finance & Accounting"] + answers,
+    ])
+    # Newer rows go ahead of the undated ones already held.
+    store.append(rows[400:420])
+    df, _, _ = loader.refresh()
+    assert (store.reads, store.deltas) == (1, 2)
+    assert is_time_sorted(df)
+    assert df["timestamp"].iloc[-2:].isna().all()
+    assert_matches_store(loader, store)
+    assert_matches_store(ResponseLoader(CountingStore(store._path), snapshot_path=snapshot), store)
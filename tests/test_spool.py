@@ -0,0 +1,118 @@
+import os
+import sys
+import subprocess
+
+import pytest
+
+import spool
+from spool import Spool
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_unacknowledged_rows_are_replayed(tmp_path):
+    path = str(tmp_path / "responses.spool")
+    s = Spool(path)
+    assert [s.append([i, "x"]) for i in range(1, 5)] == [1, 2, 3, 4]
+    s.ack(2)
+    s.close()
+
+    s = Spool(path)
+    assert s.acked == 2
+    assert s.pending() == [(3, [3, "x"]), (4, [4, "x"])]
+    assert s.append([5, "x"]) == 5
+    s.close()
+
+
+def test_crash_mid_write_drops_only_the_torn_line(tmp_path):
+    # The child dies without closing anything, halfway through writing a
+    # line, after two rows went out and were acknowledged.
+    path = str(tmp_path / "responses.spool")
+    code = (
+        "import os, sys\n"
+        "from spool import Spool\n"
+        "s = Spool(sys.argv[1])\n"
+        "for i in range(1, 4): s.append([i])\n"
+        "s.ack(2)\n"
+        "s._fh.write(b'4\\t[4'); s._fh.flush()\n"
+        "os._exit(1)\n"
+    )
+    proc = subprocess.run([sys.executable, "-c", code, path], cwd=ROOT)
+    assert proc.returncode == 1
+
+    s = Spool(path)
+    assert s.pending() == [(3, [3])]
+    # The torn bytes are cut off, so the next row starts on a line of its own.
+    assert s.append([4, "again"]) == 4
+    s.close()
+    with open(path, "rb") as fh:
+        assert fh.read().splitlines() == [b"1\t[1]", b"2\t[2]", b"3\t[3]", b'4\t[4,"again"]']
+    s = Spool(path)
+    assert s.pending() == [(3, [3]), (4, [4, "again"])]
+    s.close()
+
+
+def test_seq_continues_after_compaction(tmp_path, monkeypatch):
+    monkeypatch.setattr(spool, "COMPACT_BYTES", 0)
+    path = str(tmp_path / "responses.spool")
+    s = Spool(path)
+    s.append(["a"])
+    s.append(["b"])
+    s.ack(2)
+    assert os.path.getsize(path) == 0
+    s.close()
+
+    s = Spool(path)
+    assert s.pending() == []
+    assert s.append(["c"]) == 3
+    s.close()
+
+
+@pytest.mark.skipif(spool.fcntl is None, reason="no flock on this platform")
+def test_each_writer_gets_its_own_journal(tmp_path):
+    path = str(tmp_path / "responses.spool")
+    first, second = Spool(path), Spool(path)
+    assert (first.path, second.path) == (path, path + ".1")
+    assert first.append(["a"]) == 1
+    assert second.append(["b"]) == 1
+    assert first.pending() == [(1, ["a"])]
+    assert second.pending() == [(1, ["b"])]
+    first.close()
+    second.close()
+
+
+@pytest.mark.skipif(spool.fcntl is None, reason="no flock on this platform")
+def test_orphaned_journals_are_adopted(tmp_path):
+    path = str(tmp_path / "responses.spool")
+    live, gone = Spool(path), Spool(path)
+    for row in (["a"], ["b"], ["c"]):
+        gone.append(row)
+    gone.ack(1)
+    gone.close()
+
+    assert live.adopt_orphans() == 2
+    assert live.pending() == [(1, ["b"]), (2, ["c"])]
+    # The orphan is checkpointed and emptied, so nobody adopts it again.
+    assert live.adopt_orphans() == 0
+    reused = Spool(path)
+    assert reused.path == path + ".1"
+    assert reused.pending() == []
+    reused.close()
+    live.close()
+
+
+@pytest.mark.skipif(spool.fcntl is None, reason="no flock on this platform")
+def test_restart_replays_every_journal(tmp_path):
+    # Two form processes went down with rows in flight; the first writer of
+    # the next one replays its own journal and adopts the other.
+    path = str(tmp_path / "responses.spool")
+    first, second = Spool(path), Spool(path)
+    first.append(["a"])
+    second.append(["b"])
+    first.close()
+    second.close()
+
+    restarted = Spool(path)
+    assert restarted.path == path
+    assert restarted.pending() == [(1, ["a"]), (2, ["b"])]
+    restarted.close()
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_rows
+from storage import HEADER, SqliteStore
+from survey_data import QUESTION_COLS, Cube, parse_rows
+
+# SqliteStore.aggregate pushes filtering and grouping into SQL; it has to
+# agree with building the cube from the parsed rows and selecting from it,
+# malformed answers, timestamps and departments included.
+
+
+@pytest.fixture(scope="module")
+def rows():
+    return [r for chunk in generate_rows(3000, seed=5, months=6, malformed=0.02) for r in chunk]
+
+
+@pytest.fixture(scope="module")
+def store(tmp_path_factory, rows):
+    store = SqliteStore(str(tmp_path_factory.mktemp("sqlite") / "responses.db"))
+    store.append(rows)
+    yield store
+    store.close()
+
+
+@pytest.fixture(scope="module")
+def cube(rows):
+    return Cube.from_frame(parse_rows(HEADER, rows))
+
+
+@pytest.mark.parametrize("department", [None, "Information Technology"])
+@pytest.mark.parametrize("start, end", [(None, None), ("2024-02-10", "2024-04-20"), (None, "2024-03-01")])
+def test_aggregate_matches_cube(store, cube, department, start, end):
+    got = store.aggregate(department, start, end)
+    want = cube.select(department, start, end)
+    assert got.responses() == want.responses()
+    for by in (None, "department", "day"):
+        got_stats, want_stats = got.stats(by), want.stats(by)
+        for key in want_stats:
+            a, b = got_stats[key], want_stats[key]
+            if by is not None:
+                a, b = a.sort_index(), b.sort_index()
+                assert list(a.index) == list(b.index)
+            assert np.allclose(np.asarray(a[QUESTION_COLS], float), np.asarray(b[QUESTION_COLS], float), equal_nan=True), (by, key)
+    for q in (QUESTION_COLS[0], QUESTION_COLS[-1]):
+        pd.testing.assert_series_equal(got.distribution(q), want.distribution(q), check_dtype=False, check_names=False)